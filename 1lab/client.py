@@ -1,19 +1,106 @@
+import itertools
+import select
 import socket
-import json
+from protocol import recv_frame, send_frame
 
-def send_request(request, host='localhost', port=5555):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.connect((host, port))
-        sock.sendall(json.dumps(request).encode('utf-8'))
+# Команды, повтор которых после обрыва соединения ничего не меняет на сервере
+IDEMPOTENT_ACTIONS = ('get_output', 'stats')
 
-        response = b''
+class Client:
+    # Одно постоянное соединение на все команды; запросы можно отправлять
+    # пачкой, не дожидаясь ответов, ответы сопоставляются по id
+    def __init__(self, host='localhost', port=5555):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.ids = itertools.count(1)
+        self.pending = {}
+
+    def connect(self):
+        if self.sock is not None and self._closed_by_server():
+            # Сервер закрыл простаивавшее соединение: переподключаемся до
+            # отправки, а не повторяем команду после ошибки
+            self.close()
+            self.pending.clear()
+        if self.sock is None:
+            self.sock = socket.create_connection((self.host, self.port))
+        return self.sock
+
+    def _closed_by_server(self):
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return bool(readable) and self.sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send(self, request):
+        request_id = next(self.ids)
+        send_frame(self.connect(), {**request, 'id': request_id})
+        return request_id
+
+    def receive(self, request_id, on_chunk=None):
+        # Возвращает итоговый кадр ответа; кадры {"chunk"} потокового ответа
+        # передаются в on_chunk по мере получения. Кадры других запросов
+        # откладываются до их receive
         while True:
-            data = sock.recv(65536)
-            if not data:
-                break
-            response += data
+            queued = self.pending.get(request_id)
+            message = queued.pop(0) if queued else recv_frame(self.sock)
+            if message.get('id') != request_id:
+                self.pending.setdefault(message.get('id'), []).append(message)
+            elif 'chunk' in message:
+                if on_chunk:
+                    on_chunk(message['chunk'])
+            else:
+                self.pending.pop(request_id, None)
+                return message
+
+    def exchange(self, request, on_chunk=None):
+        # Итоговый кадр ответа; после обрыва соединения запрос повторяется
+        # один раз по новому соединению
+        try:
+            return self.receive(self.send(request), on_chunk)
+        except (ConnectionError, OSError):
+            self.close()
+            self.pending.clear()
+            # Изменяющая команда могла уже выполниться, повторяем только
+            # безопасные
+            if request.get('action') not in IDEMPOTENT_ACTIONS:
+                raise
+            return self.receive(self.send(request), on_chunk)
 
-        print(response.decode('utf-8'))
+    def request(self, request, on_chunk=None):
+        return self.exchange(request, on_chunk)['response']
+
+    def stream_output(self, program, tail=None, on_chunk=None):
+        # Листает вывод страницами, пока сервер возвращает "next". При
+        # обрыве повторяется только текущая страница, начиная с ее since,
+        # поэтому часть этой страницы может быть выведена дважды
+        request = {'action': 'get_output', 'program': program, 'tail': tail}
+        while True:
+            message = self.exchange(request, on_chunk)
+            if message.get('next') is None:
+                return message['response']
+            request = {'action': 'get_output', 'program': program, 'since': message['next']}
+
+    def pipeline(self, requests):
+        request_ids = [self.send(request) for request in requests]
+        return [self.receive(request_id)['response'] for request_id in request_ids]
+
+client = Client()
+
+def send_request(request):
+    try:
+        print(client.request(request))
+    except (ConnectionError, OSError) as e:
+        print(f"Соединение с сервером потеряно ({e}), команда могла не выполниться.")
+
+def print_chunk(chunk):
+    print(chunk, end='', flush=True)
 
 if __name__ == "__main__":
     while True:
@@ -22,9 +109,10 @@ if __name__ == "__main__":
         print("3. Остановить программу")
         print("4. Возобновить программу")
         print("5. Установить интервал запуска программ")
-        print("6. Выход")
+        print("6. Статистика планировщика")
+        print("7. Выход")
 
-        choice = input("Выберите действие (1-6): ")
+        choice = input("Выберите действие (1-7): ")
 
         if choice == '1':
             program = input("Введите название программы: ")
@@ -32,7 +120,11 @@ if __name__ == "__main__":
 
         elif choice == '2':
             program = input("Введите название программы: ")
-            send_request({'action': 'get_output', 'program': program})
+            tail = input("Сколько последних запусков показать (Enter — все): ").strip()
+            try:
+                print(client.stream_output(program, tail=int(tail) if tail.isdigit() else None, on_chunk=print_chunk))
+            except (ConnectionError, OSError) as e:
+                print(f"\nСоединение с сервером потеряно ({e}).")
 
         elif choice == '3':
             program = input("Введите название программы для остановки: ")
@@ -47,7 +139,11 @@ if __name__ == "__main__":
             send_request({'action': 'set_interval', 'interval': interval})
 
         elif choice == '6':
+            send_request({'action': 'stats'})
+
+        elif choice == '7':
             print("Выход из программы.")
+            client.close()
             break
 
         else:
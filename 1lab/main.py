@@ -1,3 +1,4 @@
 # 1lab/main.py
 import server
 
+server.main()
@@ -0,0 +1,324 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+# Вывод программы хранится в каталоге программы как последовательность
+# сегментов. Активный сегмент <первый запуск>.seg дописывается, заполненный
+# сжимается zlib целиком в <первый запуск>.seg.z. Рядом лежит индекс
+# <первый запуск>.idx: на каждый запуск запись фиксированной длины с номером,
+# временем, смещением и длиной вывода внутри несжатого сегмента
+SEGMENT_MAX_BYTES = int(os.getenv("OUTPUT_SEGMENT_MAX_BYTES", 4 * 1024 * 1024))
+RETENTION_BYTES = int(os.getenv("OUTPUT_RETENTION_BYTES", 256 * 1024 * 1024))
+RETENTION_SECONDS = float(os.getenv("OUTPUT_RETENTION_DAYS", 30)) * 24 * 60 * 60
+# Как часто проверять срок хранения при открытии запуска: у редко пишущей
+# программы сегмент может не заполняться неделями
+RETENTION_CHECK_INTERVAL = float(os.getenv("OUTPUT_RETENTION_CHECK_INTERVAL", 60 * 60))
+READ_CHUNK_SIZE = 64 * 1024
+RECORD = struct.Struct('<QdQQ')
+LEGACY_PREFIX = 'run_'
+LEGACY_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+class RunRecord:
+    __slots__ = ('run', 'timestamp', 'offset', 'length')
+
+    def __init__(self, run, timestamp, offset, length):
+        self.run = run
+        self.timestamp = timestamp
+        self.offset = offset
+        self.length = length
+
+    @property
+    def name(self):
+        return LEGACY_PREFIX + datetime.fromtimestamp(self.timestamp).strftime(LEGACY_FORMAT)
+
+
+class _Segment:
+    def __init__(self, folder, first_run, sealed):
+        self.first_run = first_run
+        self.sealed = sealed
+        base = os.path.join(folder, f"{first_run:012d}")
+        self.index_path = base + '.idx'
+        self.data_path = base + ('.seg.z' if sealed else '.seg')
+
+    def count(self):
+        try:
+            return os.path.getsize(self.index_path) // RECORD.size
+        except FileNotFoundError:
+            return 0
+
+    def records(self, start=0, stop=None):
+        # Записи индекса с позиции start до stop (номера внутри сегмента)
+        with open(self.index_path, 'rb') as f:
+            f.seek(start * RECORD.size)
+            size = -1 if stop is None else (stop - start) * RECORD.size
+            data = f.read(size)
+        return [RunRecord(*RECORD.unpack_from(data, pos)) for pos in range(0, len(data) - RECORD.size + 1, RECORD.size)]
+
+    def disk_size(self):
+        size = 0
+        for path in (self.index_path, self.data_path):
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return size
+
+
+class RunWriter:
+    # Вывод одного запуска; пишется прямо в конец активного сегмента,
+    # запись индекса появляется при close, поэтому недописанный запуск
+    # читатели не видят
+    def __init__(self, log, timestamp):
+        self._log = log
+        self._timestamp = timestamp
+        self._file = open(log.active.data_path, 'ab')
+        self._offset = self._file.tell()
+        self.length = 0
+
+    def write(self, data):
+        self._file.write(data)
+        self.length += len(data)
+
+    def close(self):
+        self._file.close()
+        return self._log.commit_run(self._timestamp, self._offset, self.length)
+
+
+class _ProgramLog:
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.segments = self._scan()
+        if not self.segments or self.segments[-1].sealed:
+            first_run = self.segments[-1].first_run + self.segments[-1].count() if self.segments else 0
+            self.segments.append(_Segment(folder, first_run, sealed=False))
+        self.active = self.segments[-1]
+        self.active_count = self.active.count()
+        self._next_retention = 0
+        self._import_legacy()
+
+    def _scan(self):
+        segments = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.idx'):
+                first_run = int(name[:-4])
+                sealed = os.path.exists(os.path.join(self.folder, name[:-4] + '.seg.z'))
+                segment = _Segment(self.folder, first_run, sealed)
+                if sealed and os.path.exists(segment.data_path[:-2]):
+                    # Сервер остановился между сжатием сегмента и удалением
+                    # несжатой копии
+                    os.remove(segment.data_path[:-2])
+                segments.append(segment)
+        segments.sort(key=lambda segment: segment.first_run)
+        return segments
+
+    def _import_legacy(self):
+        # Файлы run_*.txt прежнего формата переносятся в хранилище один раз
+        legacy = sorted(name for name in os.listdir(self.folder) if name.startswith(LEGACY_PREFIX))
+        for name in legacy:
+            path = os.path.join(self.folder, name)
+            try:
+                timestamp = datetime.strptime(name[len(LEGACY_PREFIX):-len('.txt')], LEGACY_FORMAT).timestamp()
+            except ValueError:
+                timestamp = os.path.getmtime(path)
+            writer = RunWriter(self, timestamp)
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+            writer.close()
+            os.remove(path)
+
+    def next_run(self):
+        return self.active.first_run + self.active_count
+
+    def commit_run(self, timestamp, offset, length):
+        with self.lock:
+            run = self.next_run()
+            with open(self.active.index_path, 'ab') as f:
+                f.write(RECORD.pack(run, timestamp, offset, length))
+            self.active_count += 1
+            if offset + length >= SEGMENT_MAX_BYTES:
+                self._seal()
+                self._apply_retention()
+        return run
+
+    def apply_retention_if_due(self):
+        with self.lock:
+            now = time.monotonic()
+            if now >= self._next_retention:
+                self._next_retention = now + RETENTION_CHECK_INTERVAL
+                self._apply_retention()
+
+    def _seal(self):
+        segment = self.active
+        sealed = _Segment(self.folder, segment.first_run, sealed=True)
+        compressor = zlib.compressobj()
+        with open(segment.data_path, 'rb') as src, open(sealed.data_path + '.tmp', 'wb') as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+        os.replace(sealed.data_path + '.tmp', sealed.data_path)
+        os.remove(segment.data_path)
+        self.segments[-1] = sealed
+        self.active = _Segment(self.folder, segment.first_run + self.active_count, sealed=False)
+        self.active_count = 0
+        self.segments.append(self.active)
+
+    def _apply_retention(self):
+        # Удаляются целые сжатые сегменты, начиная со старых; активный
+        # сегмент не трогаем
+        total = sum(segment.disk_size() for segment in self.segments)
+        cutoff = time.time() - RETENTION_SECONDS
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            last = oldest.records(oldest.count() - 1)
+            if total <= RETENTION_BYTES and last and last[0].timestamp >= cutoff:
+                break
+            size = oldest.disk_size()
+            try:
+                os.remove(oldest.data_path)
+                os.remove(oldest.index_path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Сегмент сейчас читается (Windows не удаляет открытые
+                # файлы), попробуем при следующей проверке
+                break
+            self.segments.pop(0)
+            total -= size
+
+    def page(self, since=0, limit=100, tail=None):
+        # Возвращает (записи страницы, номер первого хранимого запуска,
+        # номер следующего запуска)
+        with self.lock:
+            segments = list(self.segments)
+            end = self.next_run()
+        first = segments[0].first_run
+        start = max(end - tail, first) if tail else max(since, first)
+        stop = min(start + limit, end)
+        page = []
+        for i, segment in enumerate(segments):
+            segment_end = segments[i + 1].first_run if i + 1 < len(segments) else end
+            if segment_end <= start or segment.first_run >= stop:
+                continue
+            records = segment.records(max(start, segment.first_run) - segment.first_run,
+                                      min(stop, segment_end) - segment.first_run)
+            page.extend((segment, record) for record in records)
+        return page, first, end
+
+    def iter_chunks(self, page):
+        # Записи страницы идут по возрастанию, поэтому сжатый сегмент
+        # распаковывается потоково один раз на страницу
+        i = 0
+        while i < len(page):
+            segment = page[i][0]
+            group = []
+            while i < len(page) and page[i][0] is segment:
+                group.append(page[i][1])
+                i += 1
+            try:
+                if segment.sealed:
+                    yield from _iter_sealed(segment, group)
+                else:
+                    yield from _iter_plain(segment, group)
+            except FileNotFoundError:
+                # Сегмент удален политикой хранения во время чтения
+                continue
+
+
+def _iter_plain(segment, records):
+    with open(segment.data_path, 'rb') as f:
+        for record in records:
+            yield record, None
+            f.seek(record.offset)
+            left = record.length
+            while left > 0:
+                chunk = f.read(min(left, READ_CHUNK_SIZE))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                yield record, chunk
+
+
+def _iter_sealed(segment, records):
+    decompressor = zlib.decompressobj()
+    buffer = b''
+    position = 0
+    with open(segment.data_path, 'rb') as f:
+        def fill():
+            nonlocal buffer
+            data = f.read(READ_CHUNK_SIZE)
+            if not data:
+                buffer += decompressor.flush()
+                return False
+            buffer += decompressor.decompress(data)
+            return True
+
+        for record in records:
+            yield record, None
+            # Пропускаем данные до начала запуска
+            while position + len(buffer) < record.offset:
+                position += len(buffer)
+                buffer = b''
+                if not fill():
+                    break
+            buffer = buffer[max(record.offset - position, 0):]
+            position = record.offset
+            left = record.length
+            while left > 0:
+                if not buffer and not fill():
+                    break
+                chunk = buffer[:left]
+                buffer = buffer[len(chunk):]
+                position += len(chunk)
+                left -= len(chunk)
+                yield record, chunk
+
+
+class OutputStore:
+    def __init__(self, root):
+        self.root = root
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def _log(self, program, create):
+        with self._lock:
+            log = self._logs.get(program)
+            if log is None:
+                folder = os.path.join(self.root, program)
+                if not create and not os.path.isdir(folder):
+                    return None
+                log = self._logs[program] = _ProgramLog(folder)
+            return log
+
+    def open_run(self, program, timestamp=None):
+        log = self._log(program, create=True)
+        log.apply_retention_if_due()
+        return RunWriter(log, timestamp or time.time())
+
+    def append(self, program, data, timestamp=None):
+        writer = self.open_run(program, timestamp)
+        writer.write(data)
+        return writer.close()
+
+    def page(self, program, since=0, limit=100, tail=None):
+        # None, если у программы еще нет вывода
+        log = self._log(program, create=False)
+        if log is None:
+            return None
+        return log.page(since, limit, tail)
+
+    def iter_chunks(self, program, page):
+        # Пары (запись, байты); перед данными каждого запуска — (запись, None)
+        return self._log(program, create=False).iter_chunks(page)
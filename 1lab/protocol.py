@@ -0,0 +1,63 @@
+import json
+import struct
+
+# Кадр — 4 байта длины (big-endian) и JSON в UTF-8
+HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(message):
+    body = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    if len(body) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Слишком большой кадр: {len(body)} байт")
+    return HEADER.pack(len(body)) + body
+
+
+def decode_body(body):
+    message = json.loads(body.decode('utf-8'))
+    if not isinstance(message, dict):
+        raise ProtocolError("Кадр должен содержать JSON-объект")
+    return message
+
+
+def _check_size(header):
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Слишком большой кадр: {size} байт")
+    return size
+
+
+async def read_frame(reader):
+    # None — соединение закрыто между кадрами; обрыв посреди кадра —
+    # ConnectionError
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except EOFError:
+        return None
+    try:
+        body = await reader.readexactly(_check_size(header))
+    except EOFError:
+        raise ConnectionError("Соединение закрыто посреди кадра")
+    return decode_body(body)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 65536))
+        if not chunk:
+            raise ConnectionError("Соединение закрыто сервером")
+        data += chunk
+    return bytes(data)
+
+
+def send_frame(sock, message):
+    sock.sendall(encode_frame(message))
+
+
+def recv_frame(sock):
+    return decode_body(_recv_exactly(sock, _check_size(_recv_exactly(sock, HEADER.size))))
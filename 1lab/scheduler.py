@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Сколько программ может выполняться одновременно
+PROGRAM_WORKERS = int(os.getenv("PROGRAM_WORKERS", 32))
+# Разброс момента следующего запуска в долях интервала
+JITTER = float(os.getenv("PROGRAM_JITTER", 0.1))
+# Как часто в лог пишется задержка планирования
+LAG_REPORT_INTERVAL = 60
+
+
+class Scheduler:
+    # Один поток с кучей сроков запуска вместо потока на программу;
+    # наступившие запуски выполняет ограниченный пул. Следующий запуск
+    # программы планируется через интервал после окончания предыдущего,
+    # поэтому одна программа не выполняется дважды одновременно
+
+    def __init__(self, run, get_interval, workers=PROGRAM_WORKERS, jitter=JITTER):
+        self._run = run
+        self._get_interval = get_interval
+        self._jitter = jitter
+        self._heap = []
+        self._seq = itertools.count()
+        # Программа -> метка текущего расписания; записи кучи с устаревшей
+        # меткой пропускаются, так что remove не ищет запись в куче
+        self._programs = {}
+        # Программы, которые сейчас выполняются, и отложенные до конца
+        # выполнения запуски: после stop и resume у программы новая метка,
+        # а прежний запуск еще может идти
+        self._running = set()
+        self._deferred = {}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='program')
+        self._stopped = False
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def add(self, program):
+        with self._cond:
+            token = object()
+            self._programs[program] = token
+            # Первый запуск — в случайный момент интервала, чтобы программы,
+            # поднятые при старте сервера, не запускались все разом
+            self._push(program, token, random.uniform(0, self._get_interval()))
+
+    def remove(self, program):
+        with self._cond:
+            self._programs.pop(program, None)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._programs.clear()
+            self._cond.notify()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'programs': len(self._programs),
+                'lag_avg': self._lag_total / self._lag_count if self._lag_count else 0.0,
+                'lag_max': self._lag_max,
+            }
+
+    def _push(self, program, token, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), program, token))
+        self._cond.notify()
+
+    def _loop(self):
+        last_report = time.monotonic()
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                if now - last_report >= LAG_REPORT_INTERVAL:
+                    last_report = now
+                    self._report_lag()
+                if not self._heap:
+                    self._cond.wait(LAG_REPORT_INTERVAL)
+                    continue
+                due, _, program, token = self._heap[0]
+                if due > now:
+                    self._cond.wait(min(due - now, LAG_REPORT_INTERVAL))
+                    continue
+                heapq.heappop(self._heap)
+                if self._programs.get(program) is not token:
+                    continue
+                if program in self._running:
+                    self._deferred[program] = token
+                    continue
+                self._running.add(program)
+                self._pool.submit(self._execute, program, token, due)
+
+    def _execute(self, program, token, due):
+        # Задержка считается до фактического старта, то есть включает и
+        # ожидание свободного исполнителя
+        lag = time.monotonic() - due
+        with self._cond:
+            self._lag_count += 1
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+        try:
+            self._run(program)
+        except Exception as e:
+            logging.error(f"Ошибка запуска {program}: {e}")
+        finally:
+            with self._cond:
+                self._running.discard(program)
+                deferred = self._deferred.pop(program, None)
+                current = self._programs.get(program)
+                if not self._stopped and current is not None and current in (token, deferred):
+                    interval = self._get_interval()
+                    self._push(program, current, interval * (1 + random.uniform(-self._jitter, self._jitter)))
+
+    def _report_lag(self):
+        if self._lag_count:
+            logging.info(
+                f"Задержка планирования: средняя {self._lag_total / self._lag_count:.3f} с, "
+                f"максимальная {self._lag_max:.3f} с, запусков {self._lag_count}"
+            )
+        self._lag_count = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
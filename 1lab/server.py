@@ -1,19 +1,46 @@
+import asyncio
+import codecs
 import os
-import socket
-import threading
-import subprocess
-import json
-import time
 import shutil
 import logging
 import signal
-import sys
-from datetime import datetime
+from concurrent.futures import CancelledError
+from output_store import OutputStore
+from protocol import ProtocolError, encode_frame, read_frame
+from scheduler import Scheduler
+from state_store import StateStore
 
 DATA_FILE = 'programs_data.json'
 OUTPUT_DIR = 'programs_output'
 INTERVAL = 10
-program_threads = {}
+HOST = 'localhost'
+PORT = 5555
+# Сколько запросов одного соединения может обрабатываться одновременно
+MAX_PIPELINE = 64
+# get_output отдает вывод порциями, не собирая весь ответ в памяти
+OUTPUT_PAGE_RUNS = 100
+# Ограничения запуска по умолчанию; timeout и max_output можно задать
+# программе при добавлении
+PROGRAM_TIMEOUT = float(os.getenv("PROGRAM_TIMEOUT", 300))
+PROGRAM_OUTPUT_LIMIT = int(os.getenv("PROGRAM_OUTPUT_LIMIT", 16 * 1024 * 1024))
+PROGRAM_ENCODING = os.getenv("PROGRAM_ENCODING", 'cp866')
+# Сколько подпроцессов может выполняться одновременно
+MAX_RUNNING_PROGRAMS = int(os.getenv("MAX_RUNNING_PROGRAMS", 32))
+PROGRAM_READ_SIZE = 64 * 1024
+# Вывод копится в памяти и пишется на диск в потоке порциями такого размера
+PROGRAM_FLUSH_SIZE = 256 * 1024
+# Сколько ждать завершения программы после закрытия ее каналов вывода
+PROGRAM_EXIT_WAIT = 1.0
+scheduler = None
+loop = None
+running_programs = None
+serve_task = None
+# Задачи открытых соединений; при остановке сервера они отменяются
+connections = set()
+# Программы, добавление которых еще записывается на диск
+adding_programs = set()
+output_store = OutputStore(OUTPUT_DIR)
+state_store = StateStore(DATA_FILE, {"interval": INTERVAL, "programs": {}})
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,148 +54,341 @@ def is_program_safe(program):
     return shutil.which(cmd) is not None
 
 def load_programs():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"interval": INTERVAL, "programs": {}}
-
-def save_programs(programs_data):
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(programs_data, f)
-
-def run_program(program_name, stop_event, interval):
-    folder = os.path.join(OUTPUT_DIR, program_name)
-    os.makedirs(folder, exist_ok=True)
-    while not stop_event.is_set():
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_file = os.path.join(folder, f'run_{timestamp}.txt')
-
-        result = subprocess.run(program_name, capture_output=True, shell=True)
-        stdout = result.stdout.decode('cp866', errors='ignore')
-        stderr = result.stderr.decode('cp866', errors='ignore')
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(stdout)
-            f.write(stderr)
-
-        for _ in range(interval):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
+    return state_store.load()
+
+async def save_change(change):
+    # Ответ клиенту уходит после того, как изменение попало в журнал на диске
+    await asyncio.wrap_future(state_store.record(change))
+
+def run_program(program_name):
+    # Вызывается из потока планировщика; сам запуск идет в цикле событий,
+    # поток лишь ждет его окончания, чтобы следующий запуск планировался
+    # после завершения текущего
+    try:
+        asyncio.run_coroutine_threadsafe(execute_program(program_name), loop).result()
+    except CancelledError:
+        # Сервер останавливается, запуск прерван вместе с циклом событий
+        pass
+
+async def kill_process(process):
+    # Программа запускается через оболочку, поэтому завершается все дерево
+    # процессов, иначе потомки оболочки держат открытыми каналы вывода.
+    # На POSIX группа завершается и после выхода самой оболочки
+    if process.returncode is not None and os.name == 'nt':
+        return
+    try:
+        if os.name == 'nt':
+            killer = await asyncio.create_subprocess_exec(
+                'taskkill', '/F', '/T', '/PID', str(process.pid),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            await killer.wait()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+
+async def execute_program(program_name):
+    info = programs_data['programs'].get(program_name, {})
+    timeout = float(info.get('timeout') or PROGRAM_TIMEOUT)
+    limit = int(info.get('max_output') or PROGRAM_OUTPUT_LIMIT)
+
+    async with running_programs:
+        run = await asyncio.to_thread(output_store.open_run, program_name)
+        try:
+            process = await asyncio.create_subprocess_shell(
+                program_name, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name != 'nt')
+        except OSError as e:
+            await asyncio.to_thread(run.write, f"[Не удалось запустить программу: {e}]\n".encode('utf-8'))
+            await asyncio.to_thread(run.close)
+            raise
+        notes = []
+        buffer = bytearray()
+        accepted = 0
+        flush_lock = asyncio.Lock()
+
+        async def flush():
+            # Запись на диск идет в потоке, чтобы не останавливать цикл
+            # событий; блокировка сохраняет порядок порций
+            async with flush_lock:
+                if buffer:
+                    data = bytes(buffer)
+                    buffer.clear()
+                    await asyncio.to_thread(run.write, data)
+
+        async def pump(stream):
+            # stdout и stderr пишутся в один запуск по мере поступления;
+            # декодер инкрементальный, чтобы не резать многобайтные символы
+            nonlocal accepted
+            decoder = codecs.getincrementaldecoder(PROGRAM_ENCODING)(errors='replace')
+            while True:
+                data = await stream.read(PROGRAM_READ_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text and accepted < limit:
+                    encoded = text.encode('utf-8')[:limit - accepted]
+                    buffer.extend(encoded)
+                    accepted += len(encoded)
+                    if accepted >= limit:
+                        notes.append(f"[Вывод обрезан: превышен предел {limit} байт]")
+                        await kill_process(process)
+                    if len(buffer) >= PROGRAM_FLUSH_SIZE:
+                        await flush()
+                if not data:
+                    return
+
+        pumps = [asyncio.create_task(pump(process.stdout)), asyncio.create_task(pump(process.stderr))]
+        exited = False
+        try:
+            _, pending = await asyncio.wait(pumps, timeout=timeout)
+            if pending:
+                notes.append(f"[Выполнение прервано: превышено время {timeout:g} с]")
+                logging.warning(f"Программа {program_name} прервана по таймауту")
+            else:
+                # Каналы закрыты — обычно программа уже завершилась, но она
+                # могла закрыть их и продолжить работу
+                try:
+                    await asyncio.wait_for(process.wait(), PROGRAM_EXIT_WAIT)
+                    exited = True
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Процессы убиваются при таймауте, превышении предела вывода,
+            # остановке сервера или если программа не завершилась за
+            # PROGRAM_EXIT_WAIT после закрытия каналов; после этого каналы
+            # закрываются и чтение заканчивается само
+            if not exited:
+                await kill_process(process)
+            results = await asyncio.gather(*pumps, return_exceptions=True)
+            await process.wait()
+            for note in notes:
+                buffer.extend(f"\n{note}\n".encode('utf-8'))
+            await flush()
+            await asyncio.to_thread(run.close)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
 
 def start_programs(programs_data):
+    global scheduler, loop, running_programs
+    loop = asyncio.get_running_loop()
+    running_programs = asyncio.Semaphore(MAX_RUNNING_PROGRAMS)
+    # Интервал читается при планировании каждого запуска, поэтому
+    # set_interval действует и на уже запущенные программы
+    scheduler = Scheduler(run_program, lambda: programs_data['interval'])
     for prog, info in programs_data['programs'].items():
         if info['active']:
-            stop_event = threading.Event()
-            thread = threading.Thread(target=run_program, args=(prog, stop_event, programs_data['interval']), daemon=True)
-            program_threads[prog] = {'thread': thread, 'event': stop_event}
-            thread.start()
+            scheduler.add(prog)
+    scheduler.start()
 
-def handle_client(conn, addr, programs_data):
-    try:
-        data = conn.recv(4096).decode('utf-8')
-        request = json.loads(data)
-        action = request.get('action')
-        program = request.get('program')
-
-        response = "Неизвестная команда."
-
-        if action == 'add':
-            if not is_program_safe(program):
-                response = f"Ошибка: Программа '{program}' не найдена или недоступна."
-                logging.warning(response)
-            elif program not in programs_data['programs']:
-                programs_data['programs'][program] = {'active': True}
-                save_programs(programs_data)
-                stop_event = threading.Event()
-                thread = threading.Thread(target=run_program, args=(program, stop_event, programs_data['interval']), daemon=True)
-                program_threads[program] = {'thread': thread, 'event': stop_event}
-                thread.start()
-                response = f"Программа {program} добавлена и запущена."
-                logging.info(response)
-            else:
-                response = f"Программа {program} уже существует."
-                logging.info(response)
-
-        elif action == 'stop':
-            if program in program_threads:
-                program_threads[program]['event'].set()
-                programs_data['programs'][program]['active'] = False
-                save_programs(programs_data)
-                response = f"Программа {program} остановлена."
-                logging.info(response)
-            else:
-                response = f"Программа {program} не найдена."
-                logging.warning(response)
-
-        elif action == 'resume':
-            if program in programs_data['programs'] and not programs_data['programs'][program]['active']:
-                stop_event = threading.Event()
-                thread = threading.Thread(target=run_program, args=(program, stop_event, programs_data['interval']), daemon=True)
-                program_threads[program] = {'thread': thread, 'event': stop_event}
-                thread.start()
-                programs_data['programs'][program]['active'] = True
-                save_programs(programs_data)
-                response = f"Программа {program} возобновлена."
-                logging.info(response)
-            else:
-                response = f"Программа {program} уже выполняется или не найдена."
-                logging.warning(response)
+async def process_request(request, programs_data):
+    action = request.get('action')
+    program = request.get('program')
+
+    response = "Неизвестная команда."
 
-        elif action == 'set_interval':
+    if action == 'add':
+        if not is_program_safe(program):
+            response = f"Ошибка: Программа '{program}' не найдена или недоступна."
+            logging.warning(response)
+        elif program not in programs_data['programs'] and program not in adding_programs:
+            info = {'active': True}
             try:
-                new_interval = int(request.get('interval', INTERVAL))
-                programs_data['interval'] = new_interval
-                save_programs(programs_data)
-                response = f"Интервал установлен на {new_interval} секунд."
-                logging.info(response)
+                if request.get('timeout'):
+                    info['timeout'] = float(request['timeout'])
+                if request.get('max_output'):
+                    info['max_output'] = int(request['max_output'])
             except ValueError:
-                response = "Ошибка: Неверно указан интервал."
-                logging.error(response)
-
-        elif action == 'get_output':
-            folder = os.path.join(OUTPUT_DIR, program)
-            if os.path.exists(folder):
-                outputs = sorted(os.listdir(folder))
-                combined_output = ''
-                for file in outputs:
-                    with open(os.path.join(folder, file), 'r', encoding='utf-8') as f:
-                        combined_output += f"\n==== {file} ====\n{f.read()}\n"
-                response = combined_output
-                logging.info(f"Выведены результаты для {program}")
-            else:
-                response = f"Вывод для {program} не найден."
-                logging.warning(response)
+                return "Ошибка: Неверно указаны timeout/max_output."
+            # Пока изменение пишется на диск, повторный add той же
+            # программы должен получить отказ
+            adding_programs.add(program)
+            try:
+                await save_change({'program': program, 'info': dict(info)})
+            finally:
+                adding_programs.discard(program)
+            programs_data['programs'][program] = info
+            scheduler.add(program)
+            response = f"Программа {program} добавлена и запущена."
+            logging.info(response)
+        else:
+            response = f"Программа {program} уже существует."
+            logging.info(response)
+
+    elif action == 'stop':
+        if program in programs_data['programs']:
+            info = dict(programs_data['programs'][program], active=False)
+            await save_change({'program': program, 'info': info})
+            programs_data['programs'][program] = info
+            scheduler.remove(program)
+            response = f"Программа {program} остановлена."
+            logging.info(response)
+        else:
+            response = f"Программа {program} не найдена."
+            logging.warning(response)
+
+    elif action == 'resume':
+        if program in programs_data['programs'] and not programs_data['programs'][program]['active']:
+            info = dict(programs_data['programs'][program], active=True)
+            await save_change({'program': program, 'info': info})
+            programs_data['programs'][program] = info
+            scheduler.add(program)
+            response = f"Программа {program} возобновлена."
+            logging.info(response)
+        else:
+            response = f"Программа {program} уже выполняется или не найдена."
+            logging.warning(response)
+
+    elif action == 'set_interval':
+        try:
+            new_interval = int(request.get('interval', INTERVAL))
+            await save_change({'interval': new_interval})
+            programs_data['interval'] = new_interval
+            response = f"Интервал установлен на {new_interval} секунд."
+            logging.info(response)
+        except ValueError:
+            response = "Ошибка: Неверно указан интервал."
+            logging.error(response)
+
+    elif action == 'stats':
+        stats = scheduler.stats()
+        response = (f"Программ в расписании: {stats['programs']}, задержка запуска за последнюю минуту: "
+                    f"средняя {stats['lag_avg']:.3f} с, максимальная {stats['lag_max']:.3f} с")
+
+    return response
 
-        conn.sendall(response.encode('utf-8'))
+async def stream_output(request, writer):
+    # Вывод отправляется кадрами {"id", "chunk"}; итоговый ответ содержит
+    # "next" — номер запуска для следующей страницы или None
+    program = request.get('program')
+    try:
+        since = int(request.get('since') or 0)
+        limit = min(int(request.get('limit') or OUTPUT_PAGE_RUNS), OUTPUT_PAGE_RUNS)
+        tail = int(request['tail']) if request.get('tail') else None
+    except ValueError:
+        return "Ошибка: Неверно указаны параметры since/limit/tail.", None
+
+    result = await asyncio.to_thread(output_store.page, program, since, limit, tail)
+    if result is None:
+        response = f"Вывод для {program} не найден."
+        logging.warning(response)
+        return response, None
+    page, first, end = result
+
+    async def send_chunk(text):
+        if text:
+            writer.write(encode_frame({'id': request.get('id'), 'chunk': text}))
+            await writer.drain()
+
+    # Границы порций могут разрезать символ UTF-8, поэтому декодер
+    # инкрементальный, свой на каждый запуск
+    chunks = output_store.iter_chunks(program, page)
+    decoder = None
+    while True:
+        item = await asyncio.to_thread(next, chunks, None)
+        if item is None:
+            break
+        record, data = item
+        if data is None:
+            if decoder:
+                await send_chunk(decoder.decode(b'', final=True) + "\n")
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            await send_chunk(f"\n==== {record.name} ====\n")
+        else:
+            await send_chunk(decoder.decode(data))
+    if decoder:
+        await send_chunk(decoder.decode(b'', final=True) + "\n")
+
+    logging.info(f"Выведены результаты для {program}")
+    if not page:
+        return f"Запусков с номера {since} нет, хранятся запуски {first}-{end - 1}.", None
+    last = page[-1][1].run
+    return f"Показаны запуски {page[0][1].run}-{last} (хранятся {first}-{end - 1}).", last + 1 if last + 1 < end else None
+
+async def handle_connection(reader, writer):
+    # Соединение постоянное: клиент шлет кадры {"id", "action", ...}, не
+    # дожидаясь ответов, а ответы {"id", "response"} приходят по мере готовности
+    addr = writer.get_extra_info('peername')
+    connections.add(asyncio.current_task())
+    slots = asyncio.Semaphore(MAX_PIPELINE)
+    tasks = set()
+
+    async def serve(request):
+        try:
+            message = {'id': request.get('id')}
+            try:
+                if request.get('action') == 'get_output':
+                    message['response'], message['next'] = await stream_output(request, writer)
+                else:
+                    message['response'] = await process_request(request, programs_data)
+            except Exception as e:
+                message['response'] = f"Ошибка сервера: {e}"
+                logging.error(f"Ошибка: {e}")
+            writer.write(encode_frame(message))
+            await writer.drain()
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            request = await read_frame(reader)
+            if request is None:
+                break
+            task = asyncio.create_task(serve(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+    except (ConnectionError, ProtocolError, ValueError) as e:
+        logging.warning(f"Соединение {addr} закрыто: {e}")
+    except asyncio.CancelledError:
+        # Сервер останавливается; отмененную задачу соединения asyncio
+        # записал бы в лог как ошибку
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.close()
+        connections.discard(asyncio.current_task())
 
-    except Exception as e:
-        conn.sendall(f"Ошибка сервера: {e}".encode('utf-8'))
-        logging.error(f"Ошибка: {e}")
+async def serve_forever():
+    global serve_task
+    serve_task = asyncio.current_task()
+    start_programs(programs_data)
+    try:
+        server = await asyncio.start_server(handle_connection, HOST, PORT)
+        logging.info(f"Сервер запущен на {HOST}:{PORT}")
+        signal.signal(signal.SIGINT, graceful_shutdown)
+        signal.signal(signal.SIGTERM, graceful_shutdown)
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        logging.info("Сервер остановлен.")
     finally:
-        conn.close()
+        # Новые запуски не планируются; выполняющиеся отменит asyncio.run
+        # при закрытии цикла событий
+        scheduler.stop()
+
+def stop_serving():
+    for task in list(connections):
+        task.cancel()
+    serve_task.cancel()
 
 def graceful_shutdown(signum, frame):
+    # Обработчик сигнала только просит цикл событий остановиться: серверу
+    # и программам нужно завершиться внутри цикла, а состояние сохраняется
+    # в main, когда цикл уже закрыт
     logging.info("Получен сигнал завершения. Останавливаем программы и сохраняем состояние.")
-    for prog, thread_info in program_threads.items():
-        thread_info['event'].set()
-        logging.info(f"Остановлена программа: {prog}")
-    save_programs(programs_data)
-    sys.exit(0)
+    loop.call_soon_threadsafe(stop_serving)
 
-if __name__ == "__main__":
+def main():
+    global programs_data
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     programs_data = load_programs()
-    start_programs(programs_data)
-
-    signal.signal(signal.SIGINT, graceful_shutdown)
-    signal.signal(signal.SIGTERM, graceful_shutdown)
-
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
-        server.bind(('localhost', 5555))
-        server.listen()
-        logging.info("Сервер запущен на localhost:5555")
+    try:
+        asyncio.run(serve_forever())
+    finally:
+        state_store.close()
 
-        while True:
-            conn, addr = server.accept()
-            threading.Thread(target=handle_client, args=(conn, addr, programs_data)).start()
+if __name__ == "__main__":
+    main()
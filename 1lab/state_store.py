@@ -0,0 +1,168 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# Состояние хранится как снимок (прежний programs_data.json) и журнал
+# изменений рядом с ним. Изменение дописывается в журнал одной строкой JSON;
+# накопившиеся за окно STATE_FLUSH_DELAY изменения сбрасываются на диск
+# одним fsync. Когда журнал вырастает до STATE_COMPACT_ENTRIES строк,
+# состояние записывается в новый снимок, а журнал очищается
+FLUSH_DELAY = float(os.getenv("STATE_FLUSH_DELAY", 0.005))
+COMPACT_ENTRIES = int(os.getenv("STATE_COMPACT_ENTRIES", 1000))
+
+
+def apply_change(state, change):
+    # Изменения — полные значения, а не приращения, поэтому повторное
+    # применение журнала поверх более нового снимка ничего не портит
+    if 'interval' in change:
+        state['interval'] = change['interval']
+    if 'program' in change:
+        state['programs'][change['program']] = change['info']
+
+
+def _fsync_dir(path):
+    # На Windows каталог не открыть для fsync, там rename и так сохраняется
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class StateStore:
+    def __init__(self, path, default):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self._state = copy.deepcopy(default)
+        self._journal = None
+        self._entries = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, name='state-flush', daemon=True)
+
+    def load(self):
+        # Снимок, поверх него журнал. Последняя строка журнала может быть
+        # оборвана при аварийной остановке — она отбрасывается, даже если
+        # это корректный JSON без перевода строки: иначе следующая запись
+        # приклеится к ней
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._state = json.load(f)
+        good_size = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        logging.warning(f"Журнал {self.journal_path} оборван, хвост отброшен")
+                        break
+                    try:
+                        change = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        logging.warning(f"Журнал {self.journal_path} оборван, хвост отброшен")
+                        break
+                    apply_change(self._state, change)
+                    good_size += len(line)
+                    self._entries += 1
+        self._journal = open(self.journal_path, 'ab')
+        self._journal.truncate(good_size)
+        self._thread.start()
+        return copy.deepcopy(self._state)
+
+    def record(self, change):
+        # Future завершается, когда изменение записано на диск
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Хранилище состояния закрыто")
+            self._pending.append((change, future))
+            self._cond.notify()
+        return future
+
+    def close(self):
+        # Дописывает накопленное, сворачивает журнал в снимок
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self._entries:
+            self._compact()
+        self._journal.close()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            # Короткая пауза, чтобы в один fsync попали изменения всех
+            # запросов, пришедших почти одновременно
+            if FLUSH_DELAY and not self._closed:
+                time.sleep(FLUSH_DELAY)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._write(batch)
+            except Exception as e:
+                logging.error(f"Ошибка записи журнала состояния: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for _, future in batch:
+                future.set_result(None)
+            if self._entries >= COMPACT_ENTRIES:
+                try:
+                    self._compact()
+                except Exception as e:
+                    logging.error(f"Ошибка сжатия журнала состояния: {e}")
+
+    def _write(self, batch):
+        data = b''.join(json.dumps(change, ensure_ascii=False).encode('utf-8') + b'\n' for change, _ in batch)
+        # Буфер после каждой порции пуст, поэтому размер файла — граница
+        # последней целиком записанной порции
+        size = os.fstat(self._journal.fileno()).st_size
+        try:
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        except Exception:
+            self._discard_tail(size)
+            raise
+        for change, _ in batch:
+            apply_change(self._state, change)
+        self._entries += len(batch)
+
+    def _discard_tail(self, size):
+        # Порция, не дописанная, например, из-за нехватки места, обрезается:
+        # следующая запись иначе продолжила бы оборванную строку, а load
+        # отбросил бы ее вместе со всем, что записано после. Буфер файла
+        # может хранить часть порции, поэтому файл открывается заново
+        try:
+            self._journal.close()
+        except OSError:
+            pass
+        os.truncate(self.journal_path, size)
+        self._journal = open(self.journal_path, 'ab')
+
+    def _compact(self):
+        # Снимок пишется во временный файл и атомарно подменяет старый;
+        # журнал очищается только после этого
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path)
+        self._journal.truncate(0)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._entries = 0
+        logging.info(f"Журнал состояния свернут в {self.path}")
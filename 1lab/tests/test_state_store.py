@@ -0,0 +1,66 @@
+import errno
+import json
+import pytest
+import state_store
+from state_store import StateStore
+
+DEFAULT = {"interval": 10, "programs": {}}
+
+
+@pytest.fixture(autouse=True)
+def no_flush_delay(monkeypatch):
+    monkeypatch.setattr(state_store, "FLUSH_DELAY", 0)
+
+
+def _store(tmp_path):
+    return StateStore(str(tmp_path / "programs_data.json"), DEFAULT)
+
+
+def test_torn_journal_tail_is_dropped_and_next_change_survives(tmp_path):
+    journal = tmp_path / "programs_data.json.journal"
+    # Последняя строка — корректный JSON, но без перевода строки
+    journal.write_bytes(
+        json.dumps({"program": "a", "info": {"active": True}}).encode() + b"\n"
+        + json.dumps({"program": "torn", "info": {"active": True}}).encode()
+    )
+    store = _store(tmp_path)
+    state = store.load()
+    assert list(state["programs"]) == ["a"]
+
+    store.record({"program": "b", "info": {"active": True}}).result(5)
+    with open(journal, "rb") as f:
+        assert [json.loads(line)["program"] for line in f] == ["a", "b"]
+    store.close()
+
+    assert list(_store(tmp_path).load()["programs"]) == ["a", "b"]
+
+
+class _FullDisk:
+    # Дописывает часть данных и падает, как при нехватке места
+    def __init__(self, journal):
+        self._journal = journal
+
+    def write(self, data):
+        self._journal.write(data[:5])
+        self._journal.flush()
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self._journal, name)
+
+
+def test_failed_write_does_not_lose_later_changes(tmp_path):
+    store = _store(tmp_path)
+    store.load()
+    store.record({"program": "a", "info": {"active": True}}).result(5)
+
+    store._journal = _FullDisk(store._journal)
+    with pytest.raises(OSError):
+        store.record({"program": "lost", "info": {"active": True}}).result(5)
+
+    store.record({"program": "b", "info": {"active": True}}).result(5)
+    # Загрузка до close: состояние восстанавливается из журнала, а не из снимка
+    reloaded = _store(tmp_path)
+    assert list(reloaded.load()["programs"]) == ["a", "b"]
+    reloaded.close()
+    store.close()
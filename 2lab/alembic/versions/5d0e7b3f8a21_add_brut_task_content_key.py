@@ -0,0 +1,31 @@
+"""Add brut_tasks.content_key
+
+Revision ID: 5d0e7b3f8a21
+Revises: a3c91f0d52b7
+Create Date: 2026-10-18 11:03:17.402551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e7b3f8a21'
+down_revision: Union[str, None] = 'a3c91f0d52b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('brut_tasks', sa.Column('content_key', sa.String(), nullable=True))
+    op.create_index(op.f('ix_brut_tasks_content_key'), 'brut_tasks', ['content_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_brut_tasks_content_key'), table_name='brut_tasks')
+    with op.batch_alter_table('brut_tasks') as batch_op:
+        batch_op.drop_column('content_key')
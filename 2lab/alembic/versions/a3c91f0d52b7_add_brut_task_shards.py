@@ -0,0 +1,29 @@
+"""Add brut_tasks.shards
+
+Revision ID: a3c91f0d52b7
+Revises: 818457690a60
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91f0d52b7'
+down_revision: Union[str, None] = '818457690a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('brut_tasks', sa.Column('shards', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('brut_tasks') as batch_op:
+        batch_op.drop_column('shards')
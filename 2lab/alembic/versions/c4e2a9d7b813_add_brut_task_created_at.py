@@ -0,0 +1,29 @@
+"""Add brut_tasks.created_at
+
+Revision ID: c4e2a9d7b813
+Revises: 5d0e7b3f8a21
+Create Date: 2026-10-18 13:42:05.317960
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e2a9d7b813'
+down_revision: Union[str, None] = '5d0e7b3f8a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('brut_tasks', sa.Column('created_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('brut_tasks') as batch_op:
+        batch_op.drop_column('created_at')
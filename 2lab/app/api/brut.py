@@ -1,83 +1,362 @@
+import asyncio
+import os
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from celery import chord, group
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.schemas.brut import BrutRequest, BrutResponse, BrutStatusResponse
+from app.schemas.brut import (
+    BrutBatchStatusRequest, BrutBatchStatusResponse, BrutRequest, BrutResponse, BrutStatusResponse,
+)
+from app.core.cache import TTLCache
 from app.cruds import brut_task as brut_crud
-from app.db.database import SessionLocal
+from app.api.dependencies import get_async_db, get_db, get_request_owner
+from app.db.database import AsyncSessionLocal
 from app.services.celery_worker import celery_app
+from app.services.brut_engine import inline_search, split_keyspace
+from app.services.brut_shards import (
+    fetch_task_metas, publish_progress, request_stop, shard_progress, shard_rate, shard_task_id, shard_task_ids,
+)
+from app.services import lookup_tables
+from app.services.keyspaces import build_keyspace
+from app.services.hashing import make_verifier
+from app.services.dispatch import (
+    BRUT_INLINE_BUDGET, BRUT_INLINE_MAX_WORK, acquire_slot, choose_queue, estimate_work, release_slot,
+)
+from app.services.progress_hub import progress_hub
 
 router = APIRouter()
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Не чаще одного сообщения по задаче за этот интервал на соединение
+WS_UPDATE_INTERVAL = 0.5
+MAX_STATUS_BATCH = 1000
+# Сколько задач может отслеживать одно WebSocket-соединение
+MAX_WS_SUBSCRIPTIONS = 100
+# Завершенные статусы больше не меняются, поэтому их можно отдавать из
+# памяти процесса, не обращаясь к SQLite и Redis
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+status_cache = TTLCache(maxsize=100_000, ttl=300)
+# К выполняющейся задаче присоединяемся, только если она создана за это
+# число секунд и Celery не сообщает, что она уже упала или отозвана
+REUSE_RUNNING_WINDOW = int(os.getenv("BRUT_REUSE_RUNNING_WINDOW", 60 * 60))
 
 
 @router.post("/brut_hash", response_model=BrutResponse)
-def start_brut(request: BrutRequest, db: Session = Depends(get_db)):
-    if request.max_length > 8:
+def start_brut(request: BrutRequest, db: Session = Depends(get_db), owner: str = Depends(get_request_owner)):
+    brute_mode = not (request.mask or request.wordlist)
+    if brute_mode and request.max_length > 8:
         raise HTTPException(status_code=400, detail="Максимальная длина не должна превышать 8")
+    try:
+        keyspace = build_keyspace(request.charset, request.max_length, request.mask, request.wordlist, request.rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=400, detail="Словарь не найден")
+
+    # Повторный запрос присоединяется к выполняющейся или решенной задаче
+    content_key = brut_crud.make_content_key(request.hash, request.charset, request.max_length,
+                                             request.mask, request.wordlist, request.rules)
+    existing = brut_crud.find_reusable_brut_task(
+        db, content_key, running_since=datetime.utcnow() - timedelta(seconds=REUSE_RUNNING_WINDOW))
+    if existing and _is_reusable(existing):
+        return BrutResponse(task_id=existing.task_id)
 
     task_uuid = str(uuid.uuid4())
-    # Создаем запись задачи в БД
-    brut_crud.create_brut_task(db, task_uuid)
-    # Запускаем задачу через Celery
-    celery_app.send_task('app.services.tasks.brut_force_task', args=[request.hash, request.charset, request.max_length], task_id=task_uuid)
+    # Короткие пароли по типовым charset ищем в предрасчитанных таблицах
+    cached = lookup_tables.lookup(request.hash, request.charset, request.max_length) if brute_mode else None
+    if cached is not None:
+        status, result = cached
+        brut_crud.create_brut_task(db, task_uuid, shards=0, status=status, progress=100, result=result, content_key=content_key)
+        return BrutResponse(task_id=task_uuid)
+
+    # Крошечные задачи решаем сразу, без очереди и брокера
+    verifier = make_verifier(request.hash, keyspace.alphabets)
+    work = estimate_work(keyspace, verifier)
+    if work <= BRUT_INLINE_MAX_WORK:
+        finished, password = inline_search(keyspace, verifier, BRUT_INLINE_BUDGET)
+        if finished:
+            status, result = ("completed", password) if password is not None else ("failed", "")
+            brut_crud.create_brut_task(db, task_uuid, shards=0, status=status, progress=100, result=result, content_key=content_key)
+            return BrutResponse(task_id=task_uuid)
+
+    # Остальные идут в очередь по объему: у small/medium/large свои пулы
+    # воркеров и приоритеты, а у пользователя — лимит задач в каждой
+    policy = choose_queue(work)
+    if not acquire_slot(owner, policy, task_uuid):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Превышен лимит одновременных задач в очереди {policy.name}",
+            headers={"Retry-After": "10"},
+        )
+    ranges = split_keyspace(0, keyspace.size, policy.shards)
+    task_record = None
+    try:
+        # Создаем запись задачи в БД
+        task_record = brut_crud.create_brut_task(db, task_uuid, shards=len(ranges), content_key=content_key)
+        # Пространство ключей делится между шардами, результат собирает колбэк
+        # аккорда, id которого совпадает с id задачи
+        header = group(
+            celery_app.signature('app.services.tasks.brut_shard_task',
+                                 args=[task_uuid, request.hash, request.charset, request.max_length, start, end],
+                                 kwargs={'mask': request.mask, 'wordlist': request.wordlist, 'rules': request.rules},
+                                 task_id=shard_task_id(task_uuid, i),
+                                 queue=policy.name, priority=policy.priority)
+            for i, (start, end) in enumerate(ranges)
+        )
+        body = celery_app.signature('app.services.tasks.brut_merge_task', task_id=task_uuid, queue='small', priority=0)
+        chord(header, body).apply_async(task_id=task_uuid)
+    except Exception:
+        # Задача так и не попала в очередь: слот освобождаем сразу, а запись
+        # помечаем неудачной, чтобы к ней не присоединялись повторные запросы
+        release_slot(task_uuid)
+        if task_record is not None:
+            brut_crud.update_brut_task(db, task_record, "failed", 0, "")
+        raise
     return BrutResponse(task_id=task_uuid)
 
 
+def _meta_ids(task_record) -> list:
+    return [task_record.task_id] + shard_task_ids(task_record.task_id, task_record.shards or 0)
+
+
+def _resolve_status(task_record, metas: dict):
+    # Возвращает статус задачи и признак того, что он окончательный
+    if task_record.status in TERMINAL_STATUSES:
+        # У отмененной задачи сохраняется прогресс на момент отмены
+        progress = task_record.progress if task_record.status == "cancelled" else task_record.progress or 100
+        return BrutStatusResponse(status=task_record.status, progress=progress or 0,
+                                  result=task_record.result or ""), True
+
+    state, info = metas.get(task_record.task_id, ("PENDING", None))
+
+    # Значения по умолчанию
+    status = "pending"
+    progress = task_record.progress or 0
+    result = task_record.result or ""
+    rate = 0
+
+    if state in ("PENDING", "PROGRESS") and task_record.shards:
+        # Пока колбэк аккорда не выполнен, прогресс собирается по шардам
+        states = [metas.get(shard_id, ("PENDING", None)) for shard_id in shard_task_ids(task_record.task_id, task_record.shards)]
+        states = [(shard_state, shard_info if isinstance(shard_info, dict) else None) for shard_state, shard_info in states]
+        if any(shard_state != "PENDING" for shard_state, _ in states):
+            status = "running"
+            progress = shard_progress(states)
+            rate = shard_rate(states)
+    elif state == "PROGRESS":
+        if info:
+            progress = info.get("progress", progress)
+            rate = info.get("rate", 0)
+        status = "running"
+    elif state == "SUCCESS":
+        if info:
+            status = info.get("status", "completed")
+            # Результат отмененного аккорда прогресса не содержит
+            progress = info.get("progress", progress if status == "cancelled" else 100)
+            result = info.get("result", "")
+        else:
+            status = "completed"
+            progress = 100
+    elif state in ("FAILURE", "REVOKED"):
+        status = "failed"
+        result = ""
+
+    if result is None:
+        result = ""
+    terminal = state in ("SUCCESS", "FAILURE", "REVOKED")
+    return BrutStatusResponse(status=status, progress=progress, result=result, rate=rate), terminal
+
+
+def _is_reusable(task_record) -> bool:
+    if task_record.status == "completed":
+        return True
+    response, terminal = _resolve_status(task_record, fetch_task_metas(_meta_ids(task_record)))
+    return not terminal or response.status == "completed"
+
+
 @router.get("/get_status", response_model=BrutStatusResponse)
-def get_status(task_id: str, db: Session = Depends(get_db)):
+async def get_status(task_id: str, db: AsyncSession = Depends(get_async_db)):
+    cached = status_cache.get(task_id)
+    if cached is not None:
+        return cached
     try:
-        task_record = brut_crud.get_brut_task(db, task_id)
+        task_record = await db.run_sync(brut_crud.get_brut_task, task_id)
         if not task_record:
             raise HTTPException(status_code=404, detail="Задача не найдена")
 
-        from celery.result import AsyncResult
-        res = AsyncResult(task_id, app=celery_app)
-
-        # Значения по умолчанию
-        status = "pending"
-        progress = task_record.progress or 0
-        result = task_record.result or ""  
+        metas = {}
+        if task_record.status not in TERMINAL_STATUSES:
+            metas = await run_in_threadpool(fetch_task_metas, _meta_ids(task_record))
+        # Запись в brut_tasks переносит сверщик (app.services.reconciler),
+        # здесь статус только читается
+        response, terminal = _resolve_status(task_record, metas)
+        if terminal:
+            status_cache.set(task_id, response)
+        return response
 
-        if res.state == "PENDING":
-            status = "pending"
-        elif res.state == "PROGRESS":
-            if res.info:
-                progress = res.info.get("progress", progress)
-            status = "running"
-        elif res.state == "SUCCESS":
-            if res.result:
-                meta = res.result
-                progress = meta.get("progress", 100)
-                status = meta.get("status", "completed")
-                result = meta.get("result", "")  
-            else:
-                status = "completed"
-                progress = 100
-            
-           
-            if result is None:
-                result = ""
-                
-            brut_crud.update_brut_task(db, task_record, status, progress, result)
-        elif res.state == "FAILURE":
-            status = "failed"
-            # Используем пустую строку вместо None
-            brut_crud.update_brut_task(db, task_record, status, progress, "")
-        
-     
-        if result is None:
-            result = ""
-            
-        return BrutStatusResponse(status=status, progress=progress, result=result)
-    
+    except HTTPException:
+        raise
     except Exception as e:
         # Добавляем обработку любых исключений для диагностики
         print(f"Ошибка при получении статуса задачи: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Ошибка при получении статуса: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении статуса: {str(e)}")
+
+
+def _cancel_task(task_record):
+    # Шарды и одиночная задача проверяют флаг остановки на каждом отчете о
+    # прогрессе и освобождают ядра в течение секунды; задачи, еще стоящие
+    # в очереди, отзываются и воркер их не возьмет
+    request_stop(task_record.task_id)
+    celery_app.control.revoke(_meta_ids(task_record))
+    release_slot(task_record.task_id)
+    publish_progress(task_record.task_id, {"status": "cancelled", "progress": task_record.progress or 0})
+
+
+@router.delete("/brut_hash/{task_id}", response_model=BrutStatusResponse)
+async def cancel_brut(task_id: str, db: AsyncSession = Depends(get_async_db)):
+    task_record = await db.run_sync(brut_crud.get_brut_task, task_id)
+    if not task_record:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if task_record.status in TERMINAL_STATUSES:
+        response, _ = _resolve_status(task_record, {})
+        return response
+
+    metas = await run_in_threadpool(fetch_task_metas, _meta_ids(task_record))
+    current, terminal = _resolve_status(task_record, metas)
+    if terminal:
+        # Задача успела завершиться раньше отмены, запись обновит сверщик
+        status_cache.set(task_id, current)
+        return current
+    await db.run_sync(brut_crud.update_brut_task, task_record, "cancelled", current.progress, "")
+    await run_in_threadpool(_cancel_task, task_record)
+    response, _ = _resolve_status(task_record, {})
+    status_cache.set(task_id, response)
+    return response
+
+
+@router.post("/get_status/batch", response_model=BrutBatchStatusResponse)
+async def get_status_batch(request: BrutBatchStatusRequest, db: AsyncSession = Depends(get_async_db)):
+    task_ids = list(dict.fromkeys(request.task_ids))
+    if len(task_ids) > MAX_STATUS_BATCH:
+        raise HTTPException(status_code=400, detail=f"Не более {MAX_STATUS_BATCH} задач за запрос")
+
+    statuses = {}
+    missing = []
+    for task_id in task_ids:
+        cached = status_cache.get(task_id)
+        if cached is not None:
+            statuses[task_id] = cached
+        else:
+            missing.append(task_id)
+
+    records = await db.run_sync(brut_crud.get_brut_tasks, missing)
+    live = [record for record in records if record.status not in TERMINAL_STATUSES]
+    metas = await run_in_threadpool(fetch_task_metas, [meta_id for record in live for meta_id in _meta_ids(record)])
+
+    for record in records:
+        response, terminal = _resolve_status(record, metas)
+        if terminal:
+            status_cache.set(record.task_id, response)
+        statuses[record.task_id] = response
+
+    return BrutBatchStatusResponse(statuses=statuses, not_found=[task_id for task_id in missing if task_id not in statuses])
+
+
+async def _status_snapshot(task_id: str):
+    async with AsyncSessionLocal() as db:
+        task_record = await db.run_sync(brut_crud.get_brut_task, task_id)
+        if not task_record:
+            return None, {"task_id": task_id, "status": "not_found", "progress": 0, "result": ""}
+        status = await get_status(task_id, db)
+        return task_record.shards or 1, {"task_id": task_id, **status.dict()}
+
+
+def _task_id_list(value):
+    # Список строк или None, если клиент прислал что-то другое
+    if isinstance(value, list) and all(isinstance(task_id, str) for task_id in value):
+        return value
+    return None
+
+
+@router.websocket("/ws/status")
+async def status_stream(websocket: WebSocket):
+    # Клиент шлет {"subscribe": [...]} / {"unsubscribe": [...]}, сервер —
+    # последнее состояние каждой задачи, не чаще WS_UPDATE_INTERVAL
+    await websocket.accept()
+    latest = {}
+    shard_counts = {}
+    shard_done = {}
+    shard_rates = {}
+    changed = asyncio.Event()
+
+    def on_event(task_id, event):
+        if "shard" in event:
+            done = shard_done.setdefault(task_id, {})
+            done[event["shard"]] = event["checked"] / max(event["total"], 1)
+            rates = shard_rates.setdefault(task_id, {})
+            rates[event["shard"]] = event.get("rate", 0)
+            progress = int(sum(done.values()) / shard_counts.get(task_id, 1) * 100)
+            latest[task_id] = {"task_id": task_id, "status": "running", "progress": progress,
+                               "result": "", "rate": sum(rates.values())}
+        else:
+            latest[task_id] = {"task_id": task_id, "result": "", **event}
+        changed.set()
+
+    async def flush():
+        while True:
+            await changed.wait()
+            changed.clear()
+            updates = list(latest.values())
+            latest.clear()
+            for update in updates:
+                await websocket.send_json(update)
+            await asyncio.sleep(WS_UPDATE_INTERVAL)
+
+    flusher = asyncio.create_task(flush())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                message = None
+            subscribe = unsubscribe = None
+            if isinstance(message, dict):
+                subscribe = _task_id_list(message.get("subscribe", []))
+                unsubscribe = _task_id_list(message.get("unsubscribe", []))
+            if subscribe is None or unsubscribe is None:
+                # Клиент прислал не JSON-объект со списками идентификаторов
+                await websocket.close(code=1003)
+                break
+            if len(shard_counts.keys() | set(subscribe)) > MAX_WS_SUBSCRIPTIONS:
+                await websocket.close(code=1008, reason=f"Не более {MAX_WS_SUBSCRIPTIONS} задач на соединение")
+                break
+            for task_id in subscribe:
+                if task_id in shard_counts:
+                    continue
+                shard_counts[task_id] = 1
+                progress_hub.subscribe(task_id, on_event)
+                shards, snapshot = await _status_snapshot(task_id)
+                if shards is None:
+                    progress_hub.unsubscribe(task_id, on_event)
+                    del shard_counts[task_id]
+                else:
+                    shard_counts[task_id] = shards
+                latest.setdefault(task_id, snapshot)
+                changed.set()
+            for task_id in unsubscribe:
+                progress_hub.unsubscribe(task_id, on_event)
+                shard_counts.pop(task_id, None)
+                shard_done.pop(task_id, None)
+                shard_rates.pop(task_id, None)
+                latest.pop(task_id, None)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Отправка могла упасть после разрыва соединения; ошибку забираем,
+        # чтобы она не осталась необработанной в задаче
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        for task_id in shard_counts:
+            progress_hub.unsubscribe(task_id, on_event)
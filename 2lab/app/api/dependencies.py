@@ -1,13 +1,18 @@
 # app/api/dependencies.py
 
-from fastapi import Depends, HTTPException, status
+import time
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
-from app.cruds.user import get_user_by_id
-from app.core.jwt import decode_access_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.cruds.user import CachedUser, get_user_by_id, user_cache
+from app.core.cache import TTLCache
+from app.core.jwt import ACCESS_TOKEN_EXPIRE_MINUTES, decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login/")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login/", auto_error=False)
+# Проверенные payload'ы токенов, каждый живет до своего exp
+token_cache = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 def get_db():
     db = SessionLocal()
@@ -16,9 +21,36 @@ def get_db():
     finally:
         db.close()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
+async def get_async_db():
+    # CRUD-функции синхронные, в async-эндпоинтах они вызываются через
+    # await db.run_sync(crud_function, *args)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _token_payload(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
         payload = decode_access_token(token)
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+def get_request_owner(request: Request, token: str = Depends(optional_oauth2_scheme)) -> str:
+    # Владелец запроса для лимитов: пользователь по токену, если он передан
+    # и валиден, иначе адрес клиента
+    if token:
+        try:
+            user_id = _token_payload(token).get("user_id")
+            if user_id is not None:
+                return f"user:{user_id}"
+        except Exception:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    try:
+        payload = _token_payload(token)
         user_id = payload.get("user_id")
         if user_id is None:
             raise HTTPException(
@@ -30,7 +62,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный токен",
         )
-    user = get_user_by_id(db, user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = await db.run_sync(get_user_by_id, user_id)
+        if db_user is not None:
+            user = CachedUser(db_user)
+            user_cache.set(user_id, user)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,38 +1,31 @@
 # app/api/users.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.user import UserCreate, UserResponse, UserLogin
 from app.cruds import user as user_crud
-from app.db.database import SessionLocal
 from app.core.jwt import create_access_token
-from passlib.context import CryptContext
-from app.api.dependencies import get_current_user
+from app.core.security import hash_password, verify_password
+from app.api.dependencies import get_async_db, get_current_user
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @router.post("/sign-up/", response_model=UserResponse)
-def sign_up(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = user_crud.get_user_by_email(db, user.email)
+async def sign_up(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.run_sync(user_crud.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Пользователь с таким email уже существует")
-    new_user = user_crud.create_user(db, user)
+    # bcrypt выполняется в отдельном пуле процессов с ограничением очереди
+    hashed_password = await hash_password(user.password)
+    new_user = await db.run_sync(user_crud.create_user, user, hashed_password)
     token = create_access_token({"user_id": new_user.id})
     # Возвращаем данные пользователя с токеном.
     return {**new_user.__dict__, "token": token}
 
 @router.post("/login/", response_model=UserResponse)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = user_crud.get_user_by_email(db, user.email)
-    if not db_user or not pwd_context.verify(user.password, db_user.hashed_password):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.run_sync(user_crud.get_user_by_email, user.email)
+    if not db_user or not await verify_password(user.password, db_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный email или пароль")
     token = create_access_token({"user_id": db_user.id})
     return {**db_user.__dict__, "token": token}
@@ -1,8 +1,17 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from app.models.brut_task import BrutTask
 
-def create_brut_task(db: Session, task_id: str):
-    task = BrutTask(task_id=task_id)
+def make_content_key(hash_str: str, charset: str, max_length: int, mask: str = None, wordlist: str = None, rules: list = None) -> str:
+    raw = f"{hash_str.strip().lower()}\0{charset}\0{max_length}"
+    if mask or wordlist:
+        raw += f"\0{mask or ''}\0{wordlist or ''}\0{chr(1).join(rules or [])}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def create_brut_task(db: Session, task_id: str, shards: int = 1, status: str = "running", progress: int = 0, result: str = None, content_key: str = None):
+    task = BrutTask(task_id=task_id, shards=shards, status=status, progress=progress, result=result, content_key=content_key)
     db.add(task)
     db.commit()
     db.refresh(task)
@@ -18,3 +27,46 @@ def update_brut_task(db: Session, task: BrutTask, status: str, progress: int, re
 
 def get_brut_task(db: Session, task_id: str):
     return db.query(BrutTask).filter(BrutTask.task_id == task_id).first()
+
+def get_brut_tasks(db: Session, task_ids: list):
+    # SQLite ограничивает число параметров запроса, поэтому IN идет порциями
+    tasks = []
+    for i in range(0, len(task_ids), 900):
+        tasks.extend(db.query(BrutTask).filter(BrutTask.task_id.in_(task_ids[i:i + 900])).all())
+    return tasks
+
+def find_reusable_brut_task(db: Session, content_key: str, running_since: datetime):
+    # Решенная задача с тем же содержимым или выполняющаяся, созданная не
+    # раньше running_since: старая запись "running" может принадлежать
+    # упавшей задаче, окончательный статус которой никто не записал
+    return (
+        db.query(BrutTask)
+        .filter(
+            BrutTask.content_key == content_key,
+            or_(
+                BrutTask.status == "completed",
+                and_(BrutTask.status == "running", BrutTask.created_at >= running_since),
+            ),
+        )
+        .order_by(BrutTask.id.desc())
+        .first()
+    )
+
+def get_running_brut_tasks(db: Session, after_id: int = 0, limit: int = 900):
+    return (
+        db.query(BrutTask)
+        .filter(BrutTask.status == "running", BrutTask.id > after_id)
+        .order_by(BrutTask.id)
+        .limit(limit)
+        .all()
+    )
+
+def bulk_update_brut_tasks(db: Session, updates: dict):
+    # updates: task_id -> (status, progress, result); вся пачка фиксируется
+    # одной транзакцией, окончательные статусы не перезаписываются
+    tasks = [task for task in get_brut_tasks(db, list(updates)) if task.status == "running"]
+    for task in tasks:
+        task.status, task.progress, task.result = updates[task.task_id]
+    if tasks:
+        db.commit()
+    return len(tasks)
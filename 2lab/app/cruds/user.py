@@ -1,11 +1,23 @@
 # app/cruds/user.py
 
 from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
 from app.models.user import User
 from app.schemas.user import UserCreate
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Данные пользователей для get_current_user. Хранятся копии полей, а не
+# ORM-объекты: после запроса те отвязаны от своей сессии. Изменять или
+# удалять пользователей здесь нечем, поэтому запись живет до истечения ttl
+user_cache = TTLCache(maxsize=10_000, ttl=60)
+
+
+class CachedUser:
+    __slots__ = ("id", "email", "hashed_password")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.email = user.email
+        self.hashed_password = user.hashed_password
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
@@ -13,8 +25,7 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: str):
     db_user = User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
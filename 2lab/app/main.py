@@ -1,9 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api import users, brut
+from app.core.metrics import metrics, setup_metrics
+from app.core.security import queue_depth, shutdown_password_pool
+from app.db.database import async_engine, engine
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_password_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(users.router, prefix="/api")
 app.include_router(brut.router, prefix="/api")
 
+setup_metrics(app, engines=[engine, async_engine.sync_engine])
+metrics.register_gauge("password_hash_queue_depth", "bcrypt operations waiting or running", queue_depth)
+
 # При необходимости можно добавить middleware, обработку ошибок и т.д.
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
 from app.db.database import Base
 
 class BrutTask(Base):
@@ -8,4 +9,7 @@ class BrutTask(Base):
     task_id = Column(String, unique=True, index=True)  
     status = Column(String, default="running")        
     progress = Column(Integer, default=0)
-    result = Column(String, nullable=True)             
\ No newline at end of file
+    result = Column(String, nullable=True)             
+    shards = Column(Integer, default=1)
+    content_key = Column(String, index=True, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
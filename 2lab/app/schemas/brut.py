@@ -1,9 +1,40 @@
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, validator
+from app.services.hashing import detect_algorithm
+from app.services.keyspaces import parse_mask, parse_rule, wordlist_path
 
 class BrutRequest(BaseModel):
     hash: str
-    charset: str
-    max_length: int
+    # Полный перебор: charset и max_length; маска (?l?l?d?d) или словарь
+    # с правилами ($1 — дописать в конец, ^! — в начало) их заменяют
+    charset: str = ""
+    max_length: int = 0
+    mask: Optional[str] = None
+    wordlist: Optional[str] = None
+    rules: List[str] = []
+
+    @validator("hash")
+    def check_hash(cls, value):
+        value = value.strip()
+        detect_algorithm(value)
+        return value
+
+    @validator("mask")
+    def check_mask(cls, value):
+        if value is not None:
+            parse_mask(value)
+        return value
+
+    @validator("wordlist")
+    def check_wordlist(cls, value):
+        if value is not None:
+            wordlist_path(value)
+        return value
+
+    @validator("rules", each_item=True)
+    def check_rule(cls, value):
+        parse_rule(value)
+        return value
 
 class BrutResponse(BaseModel):
     task_id: str
@@ -12,3 +43,11 @@ class BrutStatusResponse(BaseModel):
     status: str
     progress: int
     result: str = None
+    rate: int = 0
+
+class BrutBatchStatusRequest(BaseModel):
+    task_ids: List[str]
+
+class BrutBatchStatusResponse(BaseModel):
+    statuses: Dict[str, BrutStatusResponse]
+    not_found: List[str] = []
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+BRUT_WORKERS = int(os.getenv("BRUT_WORKERS", os.cpu_count() or 1))
+PROGRESS_INTERVAL = float(os.getenv("BRUT_PROGRESS_INTERVAL", 0.5))
+CHECKPOINT_INTERVAL = float(os.getenv("BRUT_CHECKPOINT_INTERVAL", 30))
+# Начальный размер порции кандидатов между проверками флага остановки;
+# дальше он подстраивается так, чтобы проверки шли раз в CHECK_INTERVAL
+CHUNK_SIZE = 4096
+MAX_CHUNK_SIZE = 1 << 22
+CHECK_INTERVAL = 0.05
+
+# Заполняются в _init_worker в каждом процессе пула
+_stop = None
+_positions = None
+
+
+def keyspace_size(charset_len: int, max_length: int) -> int:
+    return sum(charset_len ** i for i in range(1, max_length + 1))
+
+
+def index_to_digits(index: int, base: int) -> list:
+    # Индексы упорядочены как в itertools.product: сначала все строки длины 1,
+    # затем длины 2 и т.д., внутри длины — лексикографически по charset
+    length = 1
+    block = base
+    while index >= block:
+        index -= block
+        length += 1
+        block *= base
+    digits = [0] * length
+    for pos in range(length - 1, -1, -1):
+        index, digits[pos] = divmod(index, base)
+    return digits
+
+
+def index_to_candidate(index: int, charset: str) -> str:
+    return "".join(charset[d] for d in index_to_digits(index, len(charset)))
+
+
+def split_keyspace(start: int, end: int, parts: int) -> list:
+    parts = max(1, min(parts, end - start))
+    step, rest = divmod(end - start, parts)
+    ranges = []
+    for i in range(parts):
+        size = step + (1 if i < rest else 0)
+        ranges.append((start, start + size))
+        start += size
+    return ranges
+
+
+def _init_worker(stop, positions):
+    global _stop, _positions
+    _stop = stop
+    _positions = positions
+
+
+def _search_range(shard: int, start: int, end: int, keyspace, verifier, on_chunk=None):
+    return keyspace.search(shard, start, end, verifier, _stop, _positions, on_chunk)
+
+
+def inline_search(keyspace, verifier, budget: float):
+    # Перебор прямо в вызывающем потоке с ограничением по времени.
+    # Возвращает (завершен ли перебор, пароль)
+    stop = threading.Event()
+    positions = [0]
+    deadline = time.monotonic() + budget
+
+    def on_chunk():
+        if time.monotonic() >= deadline:
+            stop.set()
+
+    password = keyspace.search(0, 0, keyspace.size, verifier, stop, positions, on_chunk)
+    if password is not None:
+        return True, password
+    return positions[0] >= keyspace.size, None
+
+
+def parallel_search(keyspace, verifier, on_progress=None,
+                    start: int = 0, end: int = None, workers: int = None, should_stop=None,
+                    checkpoint=None, on_checkpoint=None):
+    # keyspace — объект из app.services.keyspaces: перебирает свой диапазон
+    # индексов и отмечает пройденную позицию в общем массиве positions
+    if end is None:
+        end = keyspace.size
+    if checkpoint:
+        # Продолжаем с позиций, сохраненных прошлым запуском
+        ranges = [(pos, e) for pos, e in checkpoint if pos < e]
+    else:
+        ranges = split_keyspace(start, end, workers or BRUT_WORKERS) if start < end else []
+    if not ranges or (should_stop and should_stop()):
+        return None
+
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    positions = ctx.Array("q", [s for s, _ in ranges], lock=False)
+    done_before = (end - start) - sum(e - s for s, e in ranges)
+    last_report = last_checkpoint = time.monotonic()
+    last_checked = done_before
+
+    def checked():
+        return done_before + sum(positions[i] - s for i, (s, _) in enumerate(ranges))
+
+    def tick():
+        nonlocal last_report, last_checkpoint, last_checked
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL:
+            current = checked()
+            rate = (current - last_checked) / (now - last_report)
+            last_report, last_checked = now, current
+            if on_progress:
+                on_progress(current, rate)
+            if should_stop and should_stop():
+                stop.set()
+        if on_checkpoint and now - last_checkpoint >= CHECKPOINT_INTERVAL:
+            last_checkpoint = now
+            # Позиция — индекс, до которого диапазон уже полностью проверен
+            on_checkpoint([[positions[i], e] for i, (_, e) in enumerate(ranges)])
+
+    # Демонический процесс (prefork-пул Celery) не может порождать дочерние,
+    # поэтому в нем перебираем диапазон последовательно
+    if len(ranges) == 1 or multiprocessing.current_process().daemon:
+        _init_worker(stop, positions)
+        for shard, (s, e) in enumerate(ranges):
+            password = _search_range(shard, s, e, keyspace, verifier, tick)
+            if password is not None:
+                return password
+        return None
+
+    with ProcessPoolExecutor(len(ranges), mp_context=ctx, initializer=_init_worker,
+                             initargs=(stop, positions)) as executor:
+        pending = {executor.submit(_search_range, shard, s, e, keyspace, verifier)
+                   for shard, (s, e) in enumerate(ranges)}
+        password = None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is not None and password is None:
+                        password = result
+                        stop.set()
+                if pending:
+                    tick()
+        finally:
+            # При ошибке шарда или обработчика прогресса выход из with ждет
+            # остальные шарды — они должны остановиться, а не досчитывать
+            # свои диапазоны
+            stop.set()
+        return password
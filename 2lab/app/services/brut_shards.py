@@ -0,0 +1,93 @@
+from app.services.celery_worker import celery_app
+import json
+import os
+
+BRUT_SHARDS = int(os.getenv("BRUT_SHARDS", 4))
+# Сколько живет флаг остановки в бэкенде результатов
+STOP_FLAG_TTL = 24 * 60 * 60
+
+
+def shard_task_id(task_id: str, shard: int) -> str:
+    return f"{task_id}-{shard}"
+
+
+def shard_task_ids(task_id: str, shards: int) -> list:
+    return [shard_task_id(task_id, i) for i in range(shards)]
+
+
+def _stop_key(task_id: str) -> str:
+    return f"brut:stop:{task_id}"
+
+
+def request_stop(task_id: str):
+    # Флаг хранится в Redis бэкенда результатов, его видят все воркеры
+    celery_app.backend.client.set(_stop_key(task_id), 1, ex=STOP_FLAG_TTL)
+
+
+def stop_requested(task_id: str) -> bool:
+    return bool(celery_app.backend.client.exists(_stop_key(task_id)))
+
+
+def fetch_task_metas(task_ids: list) -> dict:
+    # Состояния задач одним MGET по ключам бэкенда результатов вместо
+    # отдельного запроса на каждый AsyncResult
+    backend = celery_app.backend
+    metas = {}
+    if not task_ids:
+        return metas
+    values = backend.client.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    for task_id, value in zip(task_ids, values):
+        if value is None:
+            metas[task_id] = ("PENDING", None)
+        else:
+            meta = backend.decode_result(value)
+            metas[task_id] = (meta["status"], meta.get("result"))
+    return metas
+
+
+def _checkpoint_key(task_id: str) -> str:
+    return f"brut:checkpoint:{task_id}"
+
+
+def save_checkpoint(task_id: str, ranges: list):
+    celery_app.backend.client.set(_checkpoint_key(task_id), json.dumps(ranges), ex=STOP_FLAG_TTL)
+
+
+def load_checkpoint(task_id: str):
+    raw = celery_app.backend.client.get(_checkpoint_key(task_id))
+    return json.loads(raw) if raw else None
+
+
+def clear_checkpoint(task_id: str):
+    celery_app.backend.client.delete(_checkpoint_key(task_id))
+
+
+def progress_channel(task_id: str) -> str:
+    return f"brut:progress:{task_id}"
+
+
+PROGRESS_CHANNEL_PATTERN = progress_channel("*")
+
+
+def publish_progress(task_id: str, event: dict):
+    # События прогресса для подписчиков WebSocket, см. app.services.progress_hub
+    celery_app.backend.client.publish(progress_channel(task_id), json.dumps(event))
+
+
+def shard_progress(states) -> int:
+    # states — пары (state, info) по каждому шарду; шарды равны по размеру,
+    # поэтому общий прогресс — среднее по долям
+    if not states:
+        return 0
+    done = 0.0
+    for state, info in states:
+        if state == "SUCCESS":
+            done += 1
+        elif state == "PROGRESS" and info:
+            done += info.get("checked", 0) / max(info.get("total", 1), 1)
+    return int(done / len(states) * 100)
+
+
+def shard_rate(states) -> int:
+    # Суммарная скорость перебора (кандидатов/с) по работающим шардам
+    return sum(info.get("rate", 0) for state, info in states if state == "PROGRESS" and info)
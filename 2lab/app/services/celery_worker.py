@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 import os
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -12,10 +13,29 @@ celery_app.conf.update({
     "task_serializer": "json",
     "result_serializer": "json",
     "accept_content": ["json"],
+    # Задача подтверждается после выполнения, поэтому при падении воркера
+    # возвращается в очередь и продолжает с контрольной точки
+    "task_acks_late": True,
+    "task_reject_on_worker_lost": True,
+    "worker_prefetch_multiplier": 1,
+    # События завершения задач читает app.services.reconciler
+    "worker_send_task_events": True,
+    # Перебор длины 7-8 идет часами, без этого Redis переотправит задачу
+    # другому воркеру через час
+    "broker_transport_options": {
+        "visibility_timeout": int(os.getenv("CELERY_VISIBILITY_TIMEOUT", 24 * 60 * 60)),
+        # Приоритеты 0-9 внутри очереди, 0 забирается первым
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
 })
 
 # Настройка импорта задач
 celery_app.conf.task_default_queue = 'default'
+# Задачи перебора распределяются API по объему (app.services.dispatch),
+# у каждой очереди свой пул воркеров
+celery_app.conf.task_queues = [Queue(name) for name in ('default', 'small', 'medium', 'large')]
 
 # Добавляем автообнаружение задач
 celery_app.autodiscover_tasks(['app.services'])
\ No newline at end of file
@@ -0,0 +1,79 @@
+from app.services.celery_worker import celery_app
+from app.services.brut_shards import BRUT_SHARDS
+import os
+import time
+
+# Задачи с объемом не больше BRUT_INLINE_MAX_WORK хэшей решаются прямо в
+# API, если укладываются в BRUT_INLINE_BUDGET секунд
+BRUT_INLINE_MAX_WORK = int(os.getenv("BRUT_INLINE_MAX_WORK", 200_000))
+BRUT_INLINE_BUDGET = float(os.getenv("BRUT_INLINE_BUDGET", 0.2))
+# Границы очередей small/medium по объему задачи в хэшах
+BRUT_SMALL_MAX_WORK = int(os.getenv("BRUT_SMALL_MAX_WORK", 50_000_000))
+BRUT_MEDIUM_MAX_WORK = int(os.getenv("BRUT_MEDIUM_MAX_WORK", 20_000_000_000))
+
+
+class QueuePolicy:
+    def __init__(self, name: str, priority: int, shards: int, user_limit: int, slot_ttl: int):
+        self.name = name
+        # В Redis-брокере Celery 0 — наивысший приоритет
+        self.priority = priority
+        self.shards = shards
+        # Сколько задач очереди один пользователь может держать одновременно
+        self.user_limit = user_limit
+        # Через сколько секунд занятый слот освобождается, даже если колбэк
+        # аккорда так и не выполнился
+        self.slot_ttl = slot_ttl
+
+
+QUEUES = {
+    "small": QueuePolicy("small", 0, 1, int(os.getenv("BRUT_USER_LIMIT_SMALL", 16)), 60 * 60),
+    "medium": QueuePolicy("medium", 3, BRUT_SHARDS, int(os.getenv("BRUT_USER_LIMIT_MEDIUM", 4)), 24 * 60 * 60),
+    "large": QueuePolicy("large", 6, BRUT_SHARDS, int(os.getenv("BRUT_USER_LIMIT_LARGE", 1)), 7 * 24 * 60 * 60),
+}
+
+
+def estimate_work(keyspace, verifier) -> int:
+    return int(keyspace.candidates * verifier.cost)
+
+
+def choose_queue(work: int) -> QueuePolicy:
+    if work <= BRUT_SMALL_MAX_WORK:
+        return QUEUES["small"]
+    if work <= BRUT_MEDIUM_MAX_WORK:
+        return QUEUES["medium"]
+    return QUEUES["large"]
+
+
+def _slots_key(owner: str, queue: str) -> str:
+    return f"brut:slots:{queue}:{owner}"
+
+
+def _slot_owner_key(task_id: str) -> str:
+    return f"brut:slot:{task_id}"
+
+
+def acquire_slot(owner: str, policy: QueuePolicy, task_id: str) -> bool:
+    # Занятые слоты — sorted set задач пользователя со временем истечения
+    client = celery_app.backend.client
+    key = _slots_key(owner, policy.name)
+    now = time.time()
+    client.zremrangebyscore(key, "-inf", now)
+    # Сначала занимаем слот, потом проверяем лимит, чтобы параллельные
+    # запросы одного пользователя не превысили его вместе
+    client.zadd(key, {task_id: now + policy.slot_ttl})
+    client.expire(key, policy.slot_ttl)
+    if client.zcard(key) > policy.user_limit:
+        client.zrem(key, task_id)
+        return False
+    # По id задачи слот освобождают колбэк аккорда и отмена
+    client.set(_slot_owner_key(task_id), f"{policy.name}:{owner}", ex=policy.slot_ttl)
+    return True
+
+
+def release_slot(task_id: str):
+    client = celery_app.backend.client
+    value = client.get(_slot_owner_key(task_id))
+    if value:
+        client.delete(_slot_owner_key(task_id))
+        queue, owner = value.decode().split(":", 1)
+        client.zrem(_slots_key(owner, queue), task_id)
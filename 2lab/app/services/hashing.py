@@ -0,0 +1,138 @@
+import hashlib
+import re
+
+# Алгоритм определяется по длине hex-представления дайджеста
+DIGEST_ALGORITHMS = {
+    32: "md5",
+    40: "sha1",
+    64: "sha256",
+    128: "sha512",
+}
+
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+# $rar5$<длина соли>$<соль>$<log2 итераций>$<iv>$<длина проверки>$<проверочное значение>
+_RAR5_RE = re.compile(
+    r"\$rar5\$(\d+)\$([0-9a-fA-F]+)\$(\d+)\$([0-9a-fA-F]+)\$(\d+)\$([0-9a-fA-F]+)"
+)
+RAR5_MAX_LG2COUNT = 24
+
+
+def parse_rar5(hash_str: str):
+    match = _RAR5_RE.fullmatch(hash_str)
+    if not match:
+        raise ValueError("Неверный формат хэша RAR5")
+    salt_len, salt, lg2count, _iv, check_len, check = match.groups()
+    salt = bytes.fromhex(salt)
+    check = bytes.fromhex(check)
+    lg2count = int(lg2count)
+    if len(salt) != int(salt_len) or len(check) != int(check_len) or len(check) != 8:
+        raise ValueError("Неверная длина соли или проверочного значения RAR5")
+    if lg2count > RAR5_MAX_LG2COUNT:
+        raise ValueError("Слишком большое число итераций RAR5")
+    return salt, lg2count, check
+
+
+def detect_algorithm(hash_str: str) -> str:
+    if hash_str.startswith("$rar5$"):
+        parse_rar5(hash_str)
+        return "rar5"
+    if not _HEX_RE.fullmatch(hash_str) or len(hash_str) not in DIGEST_ALGORITHMS:
+        raise ValueError("Неподдерживаемый формат хэша")
+    return DIGEST_ALGORITHMS[len(hash_str)]
+
+
+def _encode_alphabets(alphabets: list) -> list:
+    # Алфавит для каждой позиции кандидата, символы заранее в байтах;
+    # одинаковые алфавиты кодируются один раз
+    encoded = {}
+    return [encoded.setdefault(alphabet, [c.encode("utf-8") for c in alphabet]) for alphabet in alphabets]
+
+
+class DigestVerifier:
+    # Стоимость проверки одного кандидата в вычислениях одного хэша,
+    # по ней API оценивает объем задачи
+    cost = 1
+
+    def __init__(self, hash_hex: str, alphabets: list):
+        self.algorithm = detect_algorithm(hash_hex)
+        self.target = bytes.fromhex(hash_hex)
+        self.alphabets = _encode_alphabets(alphabets)
+        # Состояния хэша для каждого префикса текущего кандидата; создаются
+        # лениво, т.к. объекты hashlib не сериализуются в процессы пула
+        self._states = None
+        self._prefix = []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_states"] = None
+        state["_prefix"] = []
+        return state
+
+    def _prefix_state(self, prefix: list):
+        if self._states is None:
+            self._states = [getattr(hashlib, self.algorithm)()]
+            self._prefix = []
+        # Пересчитываем только разряды справа от первого отличия
+        common = 0
+        limit = min(len(prefix), len(self._prefix))
+        while common < limit and prefix[common] == self._prefix[common]:
+            common += 1
+        del self._states[common + 1:]
+        for pos in range(common, len(prefix)):
+            state = self._states[-1].copy()
+            state.update(self.alphabets[pos][prefix[pos]])
+            self._states.append(state)
+        self._prefix = list(prefix)
+        return self._states[-1]
+
+    def check_batch(self, prefix: list, lo: int, hi: int) -> int:
+        # Проверяет кандидатов prefix + alphabet[lo:hi] для следующей позиции,
+        # возвращает индекс совпавшего последнего символа или -1
+        copy = self._prefix_state(prefix).copy
+        chars = self.alphabets[len(prefix)]
+        target = self.target
+        for i in range(lo, hi):
+            state = copy()
+            state.update(chars[i])
+            if state.digest() == target:
+                return i
+        return -1
+
+    def check(self, candidate: bytes) -> bool:
+        return getattr(hashlib, self.algorithm)(candidate).digest() == self.target
+
+
+class Rar5Verifier:
+    # Один кандидат стоит 2**lg2count + 32 итераций PBKDF2, поэтому движок
+    # проверяет флаг остановки после каждой пачки
+    chunk_size = 1
+
+    def __init__(self, hash_str: str, alphabets: list):
+        self.salt, lg2count, check = parse_rar5(hash_str)
+        # PswCheck — свертка XOR значения после Count + 32 итераций до 8 байт
+        self.iterations = (1 << lg2count) + 32
+        self.cost = self.iterations * 2
+        self.target = int.from_bytes(check, "little")
+        self.alphabets = _encode_alphabets(alphabets)
+
+    def check(self, candidate: bytes) -> bool:
+        value = int.from_bytes(hashlib.pbkdf2_hmac("sha256", candidate, self.salt, self.iterations), "little")
+        folded = (value ^ (value >> 64) ^ (value >> 128) ^ (value >> 192)) & 0xFFFFFFFFFFFFFFFF
+        return folded == self.target
+
+    def check_batch(self, prefix: list, lo: int, hi: int) -> int:
+        head = b"".join(self.alphabets[pos][d] for pos, d in enumerate(prefix))
+        chars = self.alphabets[len(prefix)]
+        for i in range(lo, hi):
+            if self.check(head + chars[i]):
+                return i
+        return -1
+
+
+def make_verifier(hash_str: str, alphabets: list):
+    # alphabets — алфавиты позиций кандидата (keyspace.alphabets), для
+    # словаря пустой список: там кандидаты проверяются целиком через check()
+    hash_str = hash_str.strip()
+    if detect_algorithm(hash_str) == "rar5":
+        return Rar5Verifier(hash_str, alphabets)
+    return DigestVerifier(hash_str, alphabets)
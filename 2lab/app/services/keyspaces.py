@@ -0,0 +1,214 @@
+import mmap
+import os
+import re
+import string
+import time
+from app.services.brut_engine import CHECK_INTERVAL, CHUNK_SIZE, MAX_CHUNK_SIZE, index_to_digits, keyspace_size
+
+BRUT_WORDLISTS_DIR = os.getenv("BRUT_WORDLISTS_DIR", "./wordlists")
+MAX_CANDIDATE_LENGTH = 8
+
+# Встроенные наборы символов масок в стиле hashcat
+MASK_CHARSETS = {
+    "l": string.ascii_lowercase,
+    "u": string.ascii_uppercase,
+    "d": string.digits,
+    "s": " " + string.punctuation,
+}
+MASK_CHARSETS["a"] = "".join(MASK_CHARSETS[key] for key in "luds")
+
+# Правило словаря — последовательность операций $c (дописать символ в конец)
+# и ^c (дописать в начало); ":" оставляет слово как есть
+_RULE_RE = re.compile(r":|(?:[$^].)+")
+
+
+def parse_mask(mask: str) -> list:
+    alphabets = []
+    pos = 0
+    while pos < len(mask):
+        if mask[pos] != "?":
+            alphabets.append(mask[pos])
+            pos += 1
+            continue
+        key = mask[pos + 1:pos + 2]
+        if key == "?":
+            alphabets.append("?")
+        elif key in MASK_CHARSETS:
+            alphabets.append(MASK_CHARSETS[key])
+        else:
+            raise ValueError(f"Неизвестный набор символов маски: ?{key}")
+        pos += 2
+    if not alphabets:
+        raise ValueError("Пустая маска")
+    return alphabets
+
+
+def parse_rule(rule: str):
+    if not _RULE_RE.fullmatch(rule):
+        raise ValueError(f"Неподдерживаемое правило: {rule}")
+    head, tail = "", ""
+    for op, char in zip(rule[::2], rule[1::2]):
+        if op == "$":
+            tail += char
+        else:
+            head = char + head
+    return head.encode("utf-8"), tail.encode("utf-8")
+
+
+def wordlist_path(name: str) -> str:
+    # Словари лежат в общем каталоге API и воркеров, путь извне не принимаем
+    if not name or os.path.basename(name) != name or name.startswith("."):
+        raise ValueError("Недопустимое имя словаря")
+    return os.path.join(BRUT_WORDLISTS_DIR, name)
+
+
+class _ChunkClock:
+    # Подбирает размер порции так, чтобы проверки флага остановки и запись
+    # позиции шли примерно раз в CHECK_INTERVAL
+    def __init__(self, size: int):
+        self.size = size
+        self.last = time.monotonic()
+
+    def next_size(self) -> int:
+        now = time.monotonic()
+        elapsed = max(now - self.last, 1e-6)
+        self.last = now
+        self.size = max(1, min(MAX_CHUNK_SIZE, int(self.size * CHECK_INTERVAL / elapsed)))
+        return self.size
+
+
+class CharsetKeyspace:
+    # Кандидаты адресуются индексом. variable_length: все строки длины
+    # 1..len(alphabets) над одним алфавитом (полный перебор); иначе строки
+    # ровно len(alphabets) символов, у каждой позиции свой алфавит (маска)
+    def __init__(self, alphabets: list, variable_length: bool):
+        self.alphabets = alphabets
+        self.variable_length = variable_length
+        if variable_length:
+            self.size = keyspace_size(len(alphabets[0]), len(alphabets))
+        else:
+            self.size = 1
+            for alphabet in alphabets:
+                self.size *= len(alphabet)
+        self.candidates = self.size
+
+    def digits(self, index: int) -> list:
+        if self.variable_length:
+            return index_to_digits(index, len(self.alphabets[0]))
+        digits = [0] * len(self.alphabets)
+        for pos in range(len(self.alphabets) - 1, -1, -1):
+            index, digits[pos] = divmod(index, len(self.alphabets[pos]))
+        return digits
+
+    def candidate(self, index: int) -> str:
+        return "".join(self.alphabets[pos][d] for pos, d in enumerate(self.digits(index)))
+
+    def search(self, shard: int, start: int, end: int, verifier, stop, positions, on_chunk=None):
+        alphabets = self.alphabets
+        digits = self.digits(start)
+        index = start
+        clock = _ChunkClock(getattr(verifier, "chunk_size", CHUNK_SIZE))
+        next_check = index + clock.size
+
+        while index < end:
+            # Пачка — кандидаты с общим префиксом, отличающиеся последним символом
+            prefix = digits[:-1]
+            lo = digits[-1]
+            hi = min(len(alphabets[len(prefix)]), lo + end - index)
+            found = verifier.check_batch(prefix, lo, hi)
+            if found >= 0:
+                stop.set()
+                return "".join(alphabets[pos][d] for pos, d in enumerate(prefix)) + alphabets[len(prefix)][found]
+            index += hi - lo
+
+            # Инкремент префикса с переносом в старший разряд
+            digits[-1] = 0
+            pos = len(digits) - 2
+            while pos >= 0:
+                digits[pos] += 1
+                if digits[pos] < len(alphabets[pos]):
+                    break
+                digits[pos] = 0
+                pos -= 1
+            else:
+                if not self.variable_length:
+                    break
+                digits.append(0)
+
+            if index >= next_check:
+                next_check = index + clock.next_size()
+                positions[shard] = index
+                if on_chunk:
+                    on_chunk()
+                if stop.is_set():
+                    return None
+        positions[shard] = min(index, end)
+        return None
+
+
+class WordlistKeyspace:
+    # Индекс здесь — смещение в байтах файла словаря: диапазон [start, end)
+    # содержит слова, которые начинаются внутри него. Прогресс и скорость в
+    # этом режиме считаются в байтах словаря
+    alphabets = []
+
+    def __init__(self, name: str, rules: list = None):
+        self.path = wordlist_path(name)
+        self.rules = [parse_rule(rule) for rule in (rules or [":"])]
+        self.size = os.path.getsize(self.path)
+        # Оценка числа кандидатов: в среднем слово со строкой около 8 байт
+        self.candidates = self.size // 8 * len(self.rules)
+
+    def search(self, shard: int, start: int, end: int, verifier, stop, positions, on_chunk=None):
+        if start >= end:
+            # Пустой диапазон, в том числе пустой словарь: mmap пустого файла
+            # не создается
+            positions[shard] = end
+            return None
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            if pos > 0 and mm[pos - 1] != ord("\n"):
+                # Слово начато в предыдущем диапазоне
+                newline = mm.find(b"\n", pos, end)
+                pos = end if newline < 0 else newline + 1
+            clock = _ChunkClock(CHUNK_SIZE)
+            words = 0
+
+            while pos < end:
+                newline = mm.find(b"\n", pos)
+                line_end = len(mm) if newline < 0 else newline
+                word = mm[pos:line_end].rstrip(b"\r")
+                pos = line_end + 1
+                if word:
+                    for head, tail in self.rules:
+                        candidate = head + word + tail
+                        if verifier.check(candidate):
+                            stop.set()
+                            return candidate.decode("utf-8", errors="replace")
+                words += 1
+                if words >= clock.size:
+                    words = 0
+                    clock.next_size()
+                    positions[shard] = min(pos, end)
+                    if on_chunk:
+                        on_chunk()
+                    if stop.is_set():
+                        return None
+        positions[shard] = end
+        return None
+
+
+def build_keyspace(charset: str = "", max_length: int = 0, mask: str = None,
+                   wordlist: str = None, rules: list = None):
+    if mask and wordlist:
+        raise ValueError("Нужно указать либо маску, либо словарь")
+    if wordlist:
+        return WordlistKeyspace(wordlist, rules)
+    if mask:
+        alphabets = parse_mask(mask)
+        if len(alphabets) > MAX_CANDIDATE_LENGTH:
+            raise ValueError(f"Максимальная длина не должна превышать {MAX_CANDIDATE_LENGTH}")
+        return CharsetKeyspace(alphabets, variable_length=False)
+    if not charset or max_length < 1:
+        raise ValueError("Для полного перебора нужны charset и max_length")
+    return CharsetKeyspace([charset] * max_length, variable_length=True)
@@ -0,0 +1,151 @@
+import hashlib
+import itertools
+import mmap
+import os
+import tempfile
+import time
+from app.services.brut_engine import index_to_candidate
+from app.services.hashing import DIGEST_ALGORITHMS, detect_algorithm
+
+BRUT_TABLES_DIR = os.getenv("BRUT_TABLES_DIR", "./tables")
+# Набор таблиц через ";" в виде <алгоритм>:<charset>:<длина>
+BRUT_TABLES = os.getenv("BRUT_TABLES", "md5:abcdefghijklmnopqrstuvwxyz:5")
+INDEX_SIZE = 8
+
+# Отсутствующая настроенная таблица ищется на диске снова через этот
+# интервал, так что построенная после старта таблица подхватывается без
+# перезапуска API
+TABLE_RECHECK_INTERVAL = 60
+
+# Открытые таблицы процесса: (алгоритм, charset) -> LookupTable
+_tables = {}
+# Когда снова искать настроенную, но еще не построенную таблицу
+_next_check = {}
+
+
+def configured_tables() -> list:
+    tables = []
+    for item in BRUT_TABLES.split(";"):
+        if not item.strip():
+            continue
+        algorithm, rest = item.strip().split(":", 1)
+        charset, length = rest.rsplit(":", 1)
+        if algorithm not in DIGEST_ALGORITHMS.values():
+            raise ValueError(f"Неподдерживаемый алгоритм таблицы: {algorithm}")
+        tables.append((algorithm, charset, int(length)))
+    return tables
+
+
+def table_path(algorithm: str, charset: str, length: int) -> str:
+    charset_id = hashlib.sha1(charset.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(BRUT_TABLES_DIR, f"{algorithm}_{length}_{charset_id}.tbl")
+
+
+class LookupTable:
+    # Файл — отсортированные по дайджесту записи фиксированной длины:
+    # дайджест и big-endian индекс кандидата в пространстве ключей
+    def __init__(self, path: str, algorithm: str, charset: str, length: int):
+        self.charset = charset
+        self.length = length
+        self.digest_size = hashlib.new(algorithm).digest_size
+        self.record_size = self.digest_size + INDEX_SIZE
+        with open(path, "rb") as f:
+            # Страницы отображения только для чтения разделяются всеми
+            # процессами API через page cache
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = len(self.mm) // self.record_size
+
+    def find(self, digest: bytes):
+        mm = self.mm
+        size = self.digest_size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = mid * self.record_size
+            key = mm[offset:offset + size]
+            if key < digest:
+                lo = mid + 1
+            elif key > digest:
+                hi = mid
+            else:
+                return int.from_bytes(mm[offset + size:offset + self.record_size], "big")
+        return None
+
+
+def _get_table(algorithm: str, charset: str):
+    key = (algorithm, charset)
+    table = _tables.get(key)
+    if table is not None or time.monotonic() < _next_check.get(key, 0):
+        return table
+    configured = False
+    for table_algorithm, table_charset, length in configured_tables():
+        if table_algorithm != algorithm or table_charset != charset:
+            continue
+        configured = True
+        path = table_path(table_algorithm, table_charset, length)
+        if os.path.exists(path):
+            _next_check.pop(key, None)
+            table = _tables[key] = LookupTable(path, algorithm, charset, length)
+            return table
+    if configured:
+        _next_check[key] = time.monotonic() + TABLE_RECHECK_INTERVAL
+    return None
+
+
+def lookup(hash_str: str, charset: str, max_length: int):
+    # Возвращает (status, result), если ответ известен без перебора, иначе None
+    algorithm = detect_algorithm(hash_str)
+    if algorithm == "rar5":
+        return None
+    table = _get_table(algorithm, charset)
+    if table is None:
+        return None
+
+    index = table.find(bytes.fromhex(hash_str))
+    if index is not None:
+        password = index_to_candidate(index, charset)
+        if len(password) <= max_length:
+            return "completed", password
+    # Таблица покрывает все кандидаты до своей длины, промах в ней окончателен
+    if max_length <= table.length:
+        return "failed", ""
+    return None
+
+
+def build_table(algorithm: str, charset: str, length: int):
+    path = table_path(algorithm, charset, length)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    new = getattr(hashlib, algorithm)
+    digest_size = new().digest_size
+    record_size = digest_size + INDEX_SIZE
+    chars = [c.encode("utf-8") for c in charset]
+
+    # Записи раскладываются по 256 корзинам по первому байту дайджеста,
+    # чтобы сортировать в памяти только одну корзину за раз
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or ".") as tmp:
+        buckets = [open(os.path.join(tmp, f"{i:02x}"), "wb") for i in range(256)]
+        try:
+            index = 0
+            for candidate_length in range(1, length + 1):
+                for candidate in itertools.product(chars, repeat=candidate_length):
+                    digest = new(b"".join(candidate)).digest()
+                    buckets[digest[0]].write(digest + index.to_bytes(INDEX_SIZE, "big"))
+                    index += 1
+        finally:
+            for bucket in buckets:
+                bucket.close()
+
+        with open(path + ".tmp", "wb") as out:
+            for i in range(256):
+                with open(os.path.join(tmp, f"{i:02x}"), "rb") as bucket:
+                    data = bucket.read()
+                records = sorted(data[pos:pos + record_size] for pos in range(0, len(data), record_size))
+                out.write(b"".join(records))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+if __name__ == "__main__":
+    for algorithm, charset, length in configured_tables():
+        print(f"Строим таблицу {algorithm} длины {length} для '{charset}'...")
+        print(build_table(algorithm, charset, length))
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+import redis.asyncio as aioredis
+from app.services.celery_worker import CELERY_RESULT_BACKEND
+from app.services.brut_shards import PROGRESS_CHANNEL_PATTERN
+
+RECONNECT_DELAY = 1.0
+# Как часто цикл подписки проверяет, остались ли слушатели
+IDLE_CHECK_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressHub:
+    # Одна подписка на Redis на процесс API; события раздаются всем
+    # WebSocket-соединениям, подписанным на задачу
+    def __init__(self):
+        self._listeners = defaultdict(set)
+        self._task = None
+
+    def subscribe(self, task_id: str, listener):
+        self._listeners[task_id].add(listener)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, task_id: str, listener):
+        listeners = self._listeners.get(task_id)
+        if listeners is not None:
+            listeners.discard(listener)
+            if not listeners:
+                del self._listeners[task_id]
+
+    async def _run(self):
+        # Цикл завершается, когда слушателей не осталось; новая подписка
+        # запустит его снова. После последней проверки await нет, поэтому
+        # subscribe не может застать завершающийся, но еще не done цикл
+        while self._listeners:
+            client = aioredis.from_url(CELERY_RESULT_BACKEND)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(PROGRESS_CHANNEL_PATTERN)
+                while self._listeners:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=IDLE_CHECK_INTERVAL)
+                    if message is not None and message["type"] == "pmessage":
+                        self._dispatch(message)
+            except (ConnectionError, OSError, aioredis.RedisError) as e:
+                logger.warning("Потеряно соединение с Redis для событий прогресса: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await client.close()
+
+    def _dispatch(self, message):
+        # Ошибка в одном событии или слушателе не должна останавливать
+        # раздачу остальным подписчикам
+        task_id = message["channel"].decode()[len(PROGRESS_CHANNEL_PATTERN) - 1:]
+        listeners = self._listeners.get(task_id)
+        if not listeners:
+            return
+        try:
+            event = json.loads(message["data"])
+        except ValueError:
+            logger.warning("Некорректное событие прогресса задачи %s", task_id)
+            return
+        for listener in list(listeners):
+            try:
+                listener(task_id, event)
+            except Exception:
+                logger.exception("Ошибка обработчика прогресса задачи %s", task_id)
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,129 @@
+import logging
+import os
+import queue
+import threading
+import time
+from app.db.database import SessionLocal
+from app.cruds import brut_task as brut_crud
+from app.services.celery_worker import celery_app
+from app.services.brut_shards import fetch_task_metas
+from app.services.dispatch import release_slot
+
+# Пачка событий закрывается по размеру или по времени ожидания
+RECONCILE_BATCH_SIZE = int(os.getenv("BRUT_RECONCILE_BATCH_SIZE", 500))
+RECONCILE_FLUSH_INTERVAL = float(os.getenv("BRUT_RECONCILE_FLUSH_INTERVAL", 1.0))
+# Полный проход по незавершенным записям подбирает задачи, события которых
+# пришли, пока сверщик не работал
+RECONCILE_SWEEP_INTERVAL = float(os.getenv("BRUT_RECONCILE_SWEEP_INTERVAL", 60))
+RECONNECT_DELAY = 1.0
+TERMINAL_EVENTS = ("task-succeeded", "task-failed", "task-revoked")
+
+logger = logging.getLogger(__name__)
+
+
+def _terminal_update(state: str, info):
+    if state == "SUCCESS":
+        if isinstance(info, dict):
+            return info.get("status", "completed"), 100, info.get("result") or ""
+        return "completed", 100, ""
+    if state in ("FAILURE", "REVOKED"):
+        # Отозванную не через отмену задачу уже никто не выполнит
+        return "failed", 100, ""
+    return None
+
+
+def reconcile(task_ids) -> int:
+    # Событие шарда указывает на родительскую задачу: у шарда id вида
+    # <task_id>-<номер>, а строка brut_tasks заведена под id задачи
+    candidates = set()
+    for task_id in task_ids:
+        candidates.add(task_id)
+        candidates.add(task_id.rpartition("-")[0])
+    candidates.discard("")
+
+    updates = {}
+    for task_id, (state, info) in fetch_task_metas(sorted(candidates)).items():
+        update = _terminal_update(state, info)
+        if update is not None:
+            updates[task_id] = update
+    if not updates:
+        return 0
+    db = SessionLocal()
+    try:
+        updated = brut_crud.bulk_update_brut_tasks(db, updates)
+    finally:
+        db.close()
+    # Слот очереди обычно освобождает колбэк аккорда, но при ошибке шарда
+    # колбэк не выполняется; повторное освобождение ничего не делает
+    for task_id in updates:
+        release_slot(task_id)
+    return updated
+
+
+def sweep() -> int:
+    updated = 0
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            tasks = brut_crud.get_running_brut_tasks(db, after_id=last_id)
+        finally:
+            db.close()
+        if not tasks:
+            return updated
+        last_id = tasks[-1].id
+        updated += reconcile(task.task_id for task in tasks)
+
+
+def _receive_events(events: queue.Queue):
+    def on_event(event):
+        events.put(event["uuid"])
+
+    handlers = {name: on_event for name in TERMINAL_EVENTS}
+    while True:
+        try:
+            with celery_app.connection_for_read() as connection:
+                receiver = celery_app.events.Receiver(connection, handlers=handlers)
+                receiver.capture(limit=None, timeout=None, wakeup=False)
+        except Exception:
+            logger.exception("Потеряно соединение с брокером событий")
+            time.sleep(RECONNECT_DELAY)
+
+
+def _next_batch(events: queue.Queue) -> list:
+    try:
+        batch = [events.get(timeout=RECONCILE_FLUSH_INTERVAL)]
+    except queue.Empty:
+        return []
+    deadline = time.monotonic() + RECONCILE_FLUSH_INTERVAL
+    while len(batch) < RECONCILE_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(events.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def run():
+    # Единственный процесс, который переносит окончательные статусы задач из
+    # Celery в brut_tasks; API статусы только читает
+    events = queue.Queue()
+    threading.Thread(target=_receive_events, args=(events,), daemon=True).start()
+    last_sweep = float("-inf")
+    while True:
+        if time.monotonic() - last_sweep >= RECONCILE_SWEEP_INTERVAL:
+            last_sweep = time.monotonic()
+            logger.info("Сверка незавершенных задач: обновлено %d", sweep())
+        batch = _next_batch(events)
+        if batch:
+            updated = reconcile(batch)
+            if updated:
+                logger.info("Обновлено задач: %d из %d событий", updated, len(batch))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
@@ -1,23 +1,83 @@
 from app.services.celery_worker import celery_app
-import itertools
-import time
+from app.services.brut_engine import parallel_search
+from app.services.brut_shards import (
+    clear_checkpoint, load_checkpoint, publish_progress, request_stop, save_checkpoint, stop_requested,
+)
+from app.services.hashing import make_verifier
+from app.services.keyspaces import build_keyspace
+from app.services.dispatch import release_slot
+import functools
 
 
 @celery_app.task(bind=True, name='app.services.tasks.brut_force_task')
-def brut_force_task(self, archive_hash: str, charset: str, max_length: int):
-    total = sum(len(charset) ** i for i in range(1, max_length + 1))
-    checked = 0
-
-
-    for length in range(1, max_length + 1):
-        for candidate in itertools.product(charset, repeat=length):
-            password = "".join(candidate)
-            checked += 1
-            
-            if password == "test":
-                return {"result": password, "progress": 100, "status": "completed"}
-
-            if checked % 1000 == 0:
-                progress = int(checked / total * 100)
-                self.update_state(state='PROGRESS', meta={'progress': progress})
-    return {"result": "", "progress": 100, "status": "failed"}
\ No newline at end of file
+def brut_force_task(self, archive_hash: str, charset: str, max_length: int,
+                    mask: str = None, wordlist: str = None, rules: list = None):
+    keyspace = build_keyspace(charset, max_length, mask, wordlist, rules)
+    total = max(keyspace.size, 1)
+    last_progress = 0
+
+    def report(checked, rate):
+        nonlocal last_progress
+        progress = last_progress = int(checked / total * 100)
+        self.update_state(state='PROGRESS', meta={'progress': progress, 'rate': int(rate)})
+        publish_progress(self.request.id, {'status': 'running', 'progress': progress, 'rate': int(rate)})
+
+    # Кандидаты перебираются пулом процессов, каждый процесс берет свой
+    # непрерывный диапазон индексов пространства ключей; перезапущенная
+    # задача продолжает с сохраненной контрольной точки
+    password = parallel_search(keyspace, make_verifier(archive_hash, keyspace.alphabets), on_progress=report,
+                               should_stop=functools.partial(stop_requested, self.request.id),
+                               checkpoint=load_checkpoint(self.request.id),
+                               on_checkpoint=functools.partial(save_checkpoint, self.request.id))
+    clear_checkpoint(self.request.id)
+    if password is not None:
+        meta = {"result": password, "progress": 100, "status": "completed"}
+    elif stop_requested(self.request.id):
+        # Отмененная задача сообщает прогресс, достигнутый к моменту остановки
+        meta = {"result": "", "progress": last_progress, "status": "cancelled"}
+    else:
+        meta = {"result": "", "progress": 100, "status": "failed"}
+    publish_progress(self.request.id, meta)
+    return meta
+
+
+@celery_app.task(bind=True, name='app.services.tasks.brut_shard_task')
+def brut_shard_task(self, parent_id: str, archive_hash: str, charset: str, max_length: int, start: int, end: int,
+                    mask: str = None, wordlist: str = None, rules: list = None):
+    keyspace = build_keyspace(charset, max_length, mask, wordlist, rules)
+    total = end - start
+
+    def report(checked, rate):
+        meta = {'checked': checked, 'total': total, 'rate': int(rate)}
+        self.update_state(state='PROGRESS', meta=meta)
+        publish_progress(parent_id, {'shard': self.request.id, **meta})
+
+    password = parallel_search(keyspace, make_verifier(archive_hash, keyspace.alphabets),
+                               on_progress=report, start=start, end=end,
+                               should_stop=functools.partial(stop_requested, parent_id),
+                               checkpoint=load_checkpoint(self.request.id),
+                               on_checkpoint=functools.partial(save_checkpoint, self.request.id))
+    clear_checkpoint(self.request.id)
+    publish_progress(parent_id, {'shard': self.request.id, 'checked': total, 'total': total, 'rate': 0})
+    if password is not None:
+        # Остальные шарды увидят флаг и завершатся досрочно
+        request_stop(parent_id)
+        return {"result": password, "status": "completed"}
+    if stop_requested(parent_id):
+        return {"result": "", "status": "cancelled"}
+    return {"result": "", "status": "failed"}
+
+
+@celery_app.task(bind=True, name='app.services.tasks.brut_merge_task')
+def brut_merge_task(self, results: list):
+    meta = {"result": "", "progress": 100, "status": "failed"}
+    for shard in results:
+        if shard and shard.get("status") == "completed":
+            meta = {"result": shard["result"], "progress": 100, "status": "completed"}
+            break
+        if shard and shard.get("status") == "cancelled":
+            # Прогресс отмененной задачи сохранила отмена, здесь его не трогаем
+            meta = {"result": "", "status": "cancelled"}
+    release_slot(self.request.id)
+    publish_progress(self.request.id, meta)
+    return meta
@@ -0,0 +1,70 @@
+import hashlib
+import time
+import uuid
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _measure(call, requests: int) -> dict:
+    samples = []
+    for i in range(requests):
+        started = time.perf_counter()
+        response = call(i)
+        samples.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return {
+        "requests": requests,
+        "p50_ms": round(_percentile(samples, 0.50), 3),
+        "p99_ms": round(_percentile(samples, 0.99), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def run(requests: int = 50) -> dict:
+    from fastapi.testclient import TestClient
+    from app.api import brut as brut_api
+    from app.main import app
+
+    run_id = uuid.uuid4().hex[:8]
+    password = "benchmark-password"
+    results = {}
+    with TestClient(app) as client:
+        results["/api/sign-up/"] = _measure(
+            lambda i: client.post("/api/sign-up/", json={"email": f"bench-{run_id}-{i}@example.com", "password": password}),
+            requests,
+        )
+        results["/api/login/"] = _measure(
+            lambda i: client.post("/api/login/", json={"email": f"bench-{run_id}-0@example.com", "password": password}),
+            requests,
+        )
+        # Маленькое пространство ключей, чтобы мерить накладные расходы API,
+        # а не сам перебор; хэши разные, чтобы не срабатывала дедупликация
+        task_ids = []
+
+        def start(case):
+            def call(i):
+                digest = hashlib.md5(f"{run_id}-{case}-{i}".encode()).hexdigest()
+                response = client.post("/api/brut_hash", json={"hash": digest, "charset": "ab", "max_length": 3})
+                task_ids.append(response.json().get("task_id"))
+                return response
+            return call
+
+        results["/api/brut_hash (inline)"] = _measure(start("inline"), requests)
+        # Такую задачу dispatch решил бы прямо в API; порог отключен, чтобы
+        # мерить постановку в очередь Celery и опрос статуса
+        task_ids.clear()
+        inline_max_work = brut_api.BRUT_INLINE_MAX_WORK
+        brut_api.BRUT_INLINE_MAX_WORK = -1
+        try:
+            results["/api/brut_hash"] = _measure(start("queued"), requests)
+        finally:
+            brut_api.BRUT_INLINE_MAX_WORK = inline_max_work
+        results["/api/get_status"] = _measure(
+            lambda i: client.get("/api/get_status", params={"task_id": task_ids[i % len(task_ids)]}),
+            requests,
+        )
+    return results
@@ -0,0 +1,36 @@
+import hashlib
+import string
+import time
+
+# (charset, максимальная длина) — пространства ключей от сотен тысяч до миллионов
+CASES = [
+    (string.digits, 6),
+    (string.ascii_lowercase, 4),
+    (string.ascii_lowercase, 5),
+    (string.ascii_letters + string.digits, 3),
+    (string.ascii_letters + string.digits, 4),
+]
+QUICK_CASES = CASES[:2]
+# Дайджест, которого нет ни в одном пространстве ключей, — перебор идет целиком
+MISSING_HASH = hashlib.md5(b"\x00").hexdigest()
+
+
+def run(quick: bool = False) -> list:
+    from app.services.brut_engine import keyspace_size
+    from app.services.tasks import brut_force_task
+
+    results = []
+    for charset, length in (QUICK_CASES if quick else CASES):
+        candidates = keyspace_size(len(charset), length)
+        started = time.perf_counter()
+        outcome = brut_force_task.apply(args=[MISSING_HASH, charset, length]).get()
+        elapsed = time.perf_counter() - started
+        results.append({
+            "charset_size": len(charset),
+            "max_length": length,
+            "candidates": candidates,
+            "seconds": round(elapsed, 4),
+            "candidates_per_sec": int(candidates / elapsed),
+            "status": outcome["status"],
+        })
+    return results
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+_ready = False
+
+
+def setup():
+    # Окружение без Redis и брокера: временная SQLite, Celery в eager-режиме
+    # и fakeredis вместо клиента бэкенда результатов. Вызывается до импорта app
+    global _ready
+    if _ready:
+        return
+    workdir = tempfile.mkdtemp(prefix="brut-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+    os.environ.setdefault("CELERY_RESULT_BACKEND", "redis://localhost:6379/15")
+    os.environ.setdefault("BRUT_TABLES", "")
+    os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+    import fakeredis
+    from app.db.database import Base, engine
+    from app.models import brut_task, user  # noqa: F401
+    from app.services import tasks  # noqa: F401  (регистрация задач для eager-режима)
+    from app.services.celery_worker import celery_app
+
+    Base.metadata.create_all(bind=engine)
+    celery_app.conf.task_always_eager = True
+    celery_app.conf.task_store_eager_result = True
+    # Один экземпляр бэкенда на все потоки, иначе у потоков пула FastAPI
+    # будет собственный клиент к настоящему Redis
+    celery_app.conf.result_backend_thread_safe = True
+    celery_app.backend.client = fakeredis.FakeRedis()
+    _ready = True
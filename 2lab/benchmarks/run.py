@@ -0,0 +1,61 @@
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from benchmarks import environment
+
+
+def compare(current: dict, baseline: dict):
+    # Отношение текущих значений к базовым: >1 у скорости и <1 у задержек — лучше
+    for case in current.get("engine", []):
+        for base in baseline.get("engine", []):
+            if (base["charset_size"], base["max_length"]) == (case["charset_size"], case["max_length"]):
+                ratio = case["candidates_per_sec"] / max(base["candidates_per_sec"], 1)
+                print(f"engine charset={case['charset_size']} len={case['max_length']}: {ratio:.2f}x", file=sys.stderr)
+    for endpoint, stats in current.get("api", {}).items():
+        base = baseline.get("api", {}).get(endpoint)
+        if base:
+            print(f"{endpoint}: p50 {stats['p50_ms'] / max(base['p50_ms'], 1e-9):.2f}x, "
+                  f"p99 {stats['p99_ms'] / max(base['p99_ms'], 1e-9):.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки сервиса перебора (запуск из каталога 2lab)")
+    parser.add_argument("--quick", action="store_true", help="только маленькие пространства ключей")
+    parser.add_argument("--requests", type=int, default=50, help="запросов на эндпоинт")
+    parser.add_argument("--skip-engine", action="store_true")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output", help="файл для JSON с результатами (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого запуска для сравнения")
+    args = parser.parse_args()
+
+    environment.setup()
+    from benchmarks import bench_api, bench_engine
+    from app.services.brut_engine import BRUT_WORKERS
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "brut_workers": BRUT_WORKERS,
+    }
+    if not args.skip_engine:
+        results["engine"] = bench_engine.run(quick=args.quick)
+    if not args.skip_api:
+        results["api"] = bench_api.run(requests=args.requests)
+
+    payload = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.cruds import brut_task as brut_crud
+from app.models.brut_task import BrutTask
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_stale_running_task_is_not_reused():
+    db = _session()
+    now = datetime.utcnow()
+    db.add(BrutTask(task_id="old", status="running", content_key="k", created_at=now - timedelta(hours=2)))
+    db.add(BrutTask(task_id="legacy", status="running", content_key="k"))
+    db.commit()
+    # Записи, созданные до появления created_at
+    db.query(BrutTask).filter(BrutTask.task_id == "legacy").update({BrutTask.created_at: None})
+    db.commit()
+    assert brut_crud.find_reusable_brut_task(db, "k", running_since=now - timedelta(hours=1)) is None
+
+    db.add(BrutTask(task_id="fresh", status="running", content_key="k", created_at=now))
+    db.commit()
+    assert brut_crud.find_reusable_brut_task(db, "k", running_since=now - timedelta(hours=1)).task_id == "fresh"
+
+
+def test_completed_task_is_reused_regardless_of_age():
+    db = _session()
+    db.add(BrutTask(task_id="done", status="completed", content_key="k", created_at=datetime(2000, 1, 1)))
+    db.commit()
+    assert brut_crud.find_reusable_brut_task(db, "k", running_since=datetime.utcnow()).task_id == "done"
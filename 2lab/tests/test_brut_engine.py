@@ -0,0 +1,23 @@
+import time
+import pytest
+from app.services.brut_engine import parallel_search
+
+
+class _FailingKeyspace:
+    # Шард 0 падает сразу, остальные перебирают до флага остановки
+    size = 4
+
+    def search(self, shard, start, end, verifier, stop, positions, on_chunk=None):
+        if shard == 0:
+            raise RuntimeError("shard failed")
+        deadline = time.monotonic() + 30
+        while not stop.is_set() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return None
+
+
+def test_failed_shard_stops_siblings():
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        parallel_search(_FailingKeyspace(), verifier=None, workers=4)
+    assert time.monotonic() - started < 10
@@ -0,0 +1,23 @@
+import hashlib
+from app.services import keyspaces
+from app.services.brut_engine import inline_search
+from app.services.hashing import make_verifier
+
+
+def _wordlist(tmp_path, monkeypatch, name, content):
+    monkeypatch.setattr(keyspaces, "BRUT_WORDLISTS_DIR", str(tmp_path))
+    (tmp_path / name).write_bytes(content)
+    return keyspaces.build_keyspace(wordlist=name)
+
+
+def test_empty_wordlist_is_searched_as_not_found(tmp_path, monkeypatch):
+    keyspace = _wordlist(tmp_path, monkeypatch, "empty.txt", b"")
+    verifier = make_verifier(hashlib.md5(b"secret").hexdigest(), keyspace.alphabets)
+    assert keyspace.size == 0
+    assert inline_search(keyspace, verifier, 1.0) == (True, None)
+
+
+def test_wordlist_inline_search_finds_password(tmp_path, monkeypatch):
+    keyspace = _wordlist(tmp_path, monkeypatch, "words.txt", b"alpha\nsecret\nomega\n")
+    verifier = make_verifier(hashlib.md5(b"secret").hexdigest(), keyspace.alphabets)
+    assert inline_search(keyspace, verifier, 1.0) == (True, "secret")
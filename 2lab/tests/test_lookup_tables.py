@@ -0,0 +1,25 @@
+import hashlib
+from app.services import lookup_tables
+
+
+def test_table_built_after_first_lookup_is_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(lookup_tables, "BRUT_TABLES_DIR", str(tmp_path))
+    monkeypatch.setattr(lookup_tables, "BRUT_TABLES", "md5:ab:3")
+    monkeypatch.setattr(lookup_tables, "_tables", {})
+    monkeypatch.setattr(lookup_tables, "_next_check", {})
+    digest = hashlib.md5(b"bab").hexdigest()
+
+    assert lookup_tables.lookup(digest, "ab", 3) is None
+    lookup_tables.build_table("md5", "ab", 3)
+    # До истечения интервала повторной проверки диск не трогаем
+    assert lookup_tables.lookup(digest, "ab", 3) is None
+
+    monkeypatch.setattr(lookup_tables, "_next_check", {})
+    assert lookup_tables.lookup(digest, "ab", 3) == ("completed", "bab")
+
+
+def test_unconfigured_charset_is_not_remembered(monkeypatch):
+    monkeypatch.setattr(lookup_tables, "BRUT_TABLES", "md5:ab:3")
+    monkeypatch.setattr(lookup_tables, "_next_check", {})
+    assert lookup_tables.lookup(hashlib.md5(b"x").hexdigest(), "xyz", 3) is None
+    assert lookup_tables._next_check == {}
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.core import metrics as metrics_module
+from app.core.metrics import setup_metrics
+
+
+def _client():
+    router = APIRouter()
+
+    @router.get("/brut_hash/{task_id}")
+    async def brut_hash(task_id: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    setup_metrics(app)
+    return TestClient(app)
+
+
+def test_route_label_keeps_router_prefix_and_hides_ids(monkeypatch):
+    monkeypatch.setattr(metrics_module, "metrics", metrics_module.Metrics())
+    client = _client()
+    client.get("/api/brut_hash/1")
+    client.get("/api/brut_hash/2/")
+    client.get("/nowhere")
+    text = client.get("/metrics").text
+    assert 'route="/api/brut_hash/{task_id}"' in text
+    assert 'route="/brut_hash/{task_id}"' not in text
+    assert 'route="unmatched"' in text
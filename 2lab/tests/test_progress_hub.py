@@ -0,0 +1,41 @@
+import asyncio
+import fakeredis
+import fakeredis.aioredis
+from app.services import progress_hub as hub_module
+from app.services.brut_shards import progress_channel
+
+
+def test_hub_survives_bad_events_and_stops_without_listeners(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(hub_module.aioredis, "from_url", lambda url: fakeredis.aioredis.FakeRedis(server=server))
+    monkeypatch.setattr(hub_module, "IDLE_CHECK_INTERVAL", 0.01)
+
+    async def scenario():
+        hub = hub_module.ProgressHub()
+        received = []
+
+        def broken(task_id, event):
+            raise RuntimeError("listener failed")
+
+        def listener(task_id, event):
+            received.append(event)
+
+        hub.subscribe("t1", broken)
+        hub.subscribe("t1", listener)
+        await asyncio.sleep(0.05)
+
+        publisher = fakeredis.aioredis.FakeRedis(server=server)
+        await publisher.publish(progress_channel("t1"), b"not json")
+        await publisher.publish(progress_channel("t1"), b'{"progress": 50}')
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        assert received == [{"progress": 50}]
+        assert not hub._task.done()
+
+        hub.unsubscribe("t1", broken)
+        hub.unsubscribe("t1", listener)
+        await asyncio.wait_for(hub._task, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,9 @@
+from app.services.reconciler import _terminal_update
+
+
+def test_revoked_task_is_terminal_failure():
+    assert _terminal_update("REVOKED", None) == ("failed", 100, "")
+
+
+def test_running_task_is_not_terminal():
+    assert _terminal_update("PROGRESS", {"progress": 10}) is None
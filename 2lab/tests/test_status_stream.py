@@ -0,0 +1,34 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.api import brut as brut_api
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(brut_api.router, prefix="/api")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("message", [
+    {"subscribe": "abc"},
+    {"subscribe": [{"id": 1}]},
+    {"unsubscribe": [["a"]]},
+    ["a"],
+])
+def test_malformed_subscription_closes_with_1003(message):
+    with _client().websocket_connect("/api/ws/status") as ws:
+        ws.send_json(message)
+        with pytest.raises(WebSocketDisconnect) as e:
+            ws.receive_json()
+    assert e.value.code == 1003
+
+
+def test_subscription_limit(monkeypatch):
+    monkeypatch.setattr(brut_api, "MAX_WS_SUBSCRIPTIONS", 2)
+    with _client().websocket_connect("/api/ws/status") as ws:
+        ws.send_json({"subscribe": ["a", "b", "c"]})
+        with pytest.raises(WebSocketDisconnect) as e:
+            ws.receive_json()
+    assert e.value.code == 1008
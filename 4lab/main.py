@@ -6,6 +6,7 @@ from sqlalchemy import Column, Integer, String, ForeignKey, create_engine
 from sqlalchemy.orm import relationship, sessionmaker, Session, declarative_base
 from sqlalchemy.exc import IntegrityError
 import os
+from metrics import setup_metrics
 
 DATABASE_URL = "sqlite:///./app.db"
 
@@ -83,6 +84,7 @@ def get_db():
         db.close()
 
 app = FastAPI()
+setup_metrics(app, engines=[engine])
 
 @app.get("/cinemas", response_model=List[CinemaOut])
 def list_cinemas(db: Session = Depends(get_db)):
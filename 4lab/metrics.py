@@ -0,0 +1,147 @@
+# metrics.py
+# Взято из 2lab/app/core/metrics.py: четвертая лабораторная запускается
+# отдельно и пакет app второй не видит. Роутеров с префиксами здесь нет,
+# поэтому метка — шаблон пути маршрута как есть
+
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.responses import PlainTextResponse
+
+# Границы корзин гистограмм в секундах
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Время запросов к БД текущего HTTP-запроса. Значение — изменяемый список,
+# поэтому его видят и потоки пула, куда FastAPI копирует контекст
+_db_time = ContextVar("db_time", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    # Все значения меняются только из цикла событий, поэтому без блокировок
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}
+        self.latency = {}
+        self.db_latency = {}
+        self.gauges = {}
+
+    def register_gauge(self, name: str, help_text: str, callback):
+        self.gauges[name] = (help_text, callback)
+
+    def record(self, method: str, route: str, status: int, elapsed: float, db_elapsed: float):
+        key = (method, route)
+        self.requests[key + (str(status),)] = self.requests.get(key + (str(status),), 0) + 1
+        self.latency.setdefault(key, Histogram()).observe(elapsed)
+        self.db_latency.setdefault(key, Histogram()).observe(db_elapsed)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests being processed",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Processed requests",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), value in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {value}')
+        _render_histograms(lines, "http_request_duration_seconds", "Request latency", self.latency)
+        _render_histograms(lines, "http_request_db_seconds", "Database time per request", self.db_latency)
+        for name, (help_text, callback) in sorted(self.gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {callback()}"]
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(lines: list, name: str, help_text: str, histograms: dict):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+metrics = Metrics()
+
+
+class TimingMiddleware:
+    # Чистый ASGI-middleware: не буферизует ответ и не ломает WebSocket
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db_elapsed = [0.0]
+        token = _db_time.set(db_elapsed)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            _db_time.reset(token)
+            metrics.record(scope["method"], _route_template(scope), status, elapsed, db_elapsed[0])
+
+
+def _route_template(scope) -> str:
+    # Шаблон пути вместо фактического, чтобы число рядов не росло с каждым
+    # task_id; ненайденные пути сводятся в одну метку
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_elapsed = _db_time.get()
+    if db_elapsed is not None:
+        db_elapsed[0] += elapsed
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def setup_metrics(app, engines=()):
+    # Таймер запросов, учет времени БД и эндпоинт /metrics в формате Prometheus
+    for engine in engines:
+        instrument_engine(engine)
+    app.add_middleware(TimingMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)